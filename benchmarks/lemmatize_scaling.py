@@ -0,0 +1,63 @@
+"""
+Benchmark lemmatize() with an increasing number of worker processes.
+
+Usage:
+
+    python benchmarks/lemmatize_scaling.py [number of rows]
+
+For each number of workers (1, 2, 4, ... up to the number of CPUs) this prints
+the time taken, the throughput and the speed-up over a single process, and
+checks that the output is identical to the single-process output.
+"""
+import os
+import random
+import sys
+import time
+
+import pandas as pd
+
+import qualkit.clean
+
+WORDS = ['the', 'lecturers', 'were', 'really', 'helpful', 'recorded', 'lectures', 'more', 'face', 'to',
+         'online', 'teaching', 'running', 'seminars', 'group', 'work', 'feedback', 'on', 'assignments',
+         'wifi', 'connection', 'kept', 'dropping', 'during', 'tutorials', 'staff', 'answered', 'emails',
+         'quickly', 'timetable', 'changes', 'library', 'books', 'accessing', 'resources', 'was', 'hard']
+
+
+def make_responses(rows, seed=42):
+    rng = random.Random(seed)
+    return pd.DataFrame({'text': [' '.join(rng.choice(WORDS) for _ in range(rng.randint(3, 25)))
+                                  for _ in range(rows)]})
+
+
+def run(df, n_jobs):
+    # start each run with an empty lemma memo so that runs are comparable
+    qualkit.clean.__lemma__.cache_clear()
+    start = time.perf_counter()
+    result = qualkit.clean.lemmatize(df, 'text', n_jobs=n_jobs)
+    return time.perf_counter() - start, result
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    df = make_responses(rows)
+    cpus = os.cpu_count() or 1
+    jobs = [1]
+    while jobs[-1] * 2 <= cpus:
+        jobs.append(jobs[-1] * 2)
+    if jobs[-1] != cpus:
+        jobs.append(cpus)
+
+    baseline_time, baseline = run(df, 1)
+    print("{:>6} {:>10} {:>12} {:>8}".format('n_jobs', 'seconds', 'rows/sec', 'speedup'))
+    for n_jobs in jobs:
+        if n_jobs == 1:
+            elapsed, result = baseline_time, baseline
+        else:
+            elapsed, result = run(df, n_jobs)
+        assert result.equals(baseline), "output differs with n_jobs={}".format(n_jobs)
+        print("{:>6} {:>10.2f} {:>12.0f} {:>8.2f}".format(n_jobs, elapsed, rows / elapsed, baseline_time / elapsed))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,7 +1,7 @@
 import pandas as pd
 
 from qualkit.clean import clean, remove_dont_knows, lemmatize
-from qualkit.anchored_topic_model import anchored_topic_model, topic_metrics
+from qualkit.anchored_topic_model import anchored_topic_model, topic_metrics, DocumentTermMatrix
 
 #  Using an anchored topic model
 #  =============================
@@ -75,7 +75,9 @@ anchors = [
 
 #    ['long', 'screen', 'time', 'early', 'late']
 print("\nAnchored\n")
-df2 = anchored_topic_model(data, 'cleaned', topic_names=topic_names, anchors=anchors, print_topic_details=True, return_csv=True)
+# tokenize the text once, so the model of the unmatched responses below can reuse it
+document_terms = DocumentTermMatrix.from_text(data['cleaned'])
+df2 = anchored_topic_model(data, 'cleaned', topic_names=topic_names, anchors=anchors, print_topic_details=True, return_csv=True, document_terms=document_terms)
 # manual fix for a model problem - the single word 'nothing' doesn't get allocated to a topic
 terms = df2[(df2['Topic name'] == 'Nothing/OK')]['Topic label'].values[0]
 df2.loc[df2['cleaned'] == 'nothing', 'Topic label'] = terms
@@ -87,5 +89,5 @@ df2.to_csv('output/corex.csv')
 #
 print("\nUnmatched\n")
 unmatched = df2[(df2['Topic label'] == 'No matching topic')].copy()
-df2 = anchored_topic_model(unmatched, 'cleaned', number_of_topics=18, print_topic_details=True)
+df2 = anchored_topic_model(unmatched, 'cleaned', number_of_topics=18, print_topic_details=True, document_terms=document_terms)
 df2.to_csv('output/corex_unmatched.csv')
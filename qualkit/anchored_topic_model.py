@@ -1,8 +1,18 @@
+import hashlib
+import json
+import numbers
+import os
+import tempfile
+import time
+from contextlib import closing
+
 import pandas as pd
 import numpy as np
-from sklearn.feature_extraction.text import TfidfVectorizer
-from corextopic import corextopic as ct
-from qualkit.stopwords import stopwords
+from qualkit import parallel
+from qualkit.cache import TransformCache, config_hash
+from qualkit.coherence import topic_coherence
+from qualkit.stopwords import get_stopwords
+from qualkit.topk import feature_names, top_indices, top_terms
 
 
 def load_topics(file):
@@ -20,10 +30,12 @@ def load_topics(file):
 
 
 def __initialise_vectoriser__():
+    from sklearn.feature_extraction.text import TfidfVectorizer
+
     # Initialise the vectorizer that will split the text into tokens
     # uses the TFIDF algorithm
     # For very large datasets as a quicker option, you could fit the model on a sample of 50-100k documents,
-    # and then apply the model to the full dataset afterwards.
+    # and then apply the model to the full dataset afterwards (see fit_sample_size in anchored_topic_model).
     # You could also try narrowing the vocabulary by tweaking the TF-IDF vectorizer parameters and setting a max_features limit in below function.
 
     return TfidfVectorizer(
@@ -35,11 +47,12 @@ def __initialise_vectoriser__():
         binary=True,
         use_idf=False,
         sublinear_tf=False,
-        stop_words=stopwords
+        stop_words=get_stopwords()
     )
 
 
 def __model__(tfidf, vocab, anchors, number_of_topics, anchor_strength_int):
+    from corextopic import corextopic as ct
 
     # Filter by vocab
     if anchors is not None:
@@ -66,7 +79,43 @@ def __model__(tfidf, vocab, anchors, number_of_topics, anchor_strength_int):
     return model
 
 
-def topic_metrics(data, column, number_of_topics=25):
+def corex_weights(model):
+    """
+    Gets the weight of each term in each topic of a Corex model, ranking terms in the same way
+    as Corex's get_topics: a term's mutual information with the topic weighted by its anchor
+    strength, for the terms that belong to the topic (other terms get a weight of -inf)
+    :param model: a fitted Corex model
+    :return: an array with one row per topic and one column per term
+    """
+    return np.where(model.alpha >= 1., model.alpha * model.mis, -np.inf)
+
+
+def topic_terms(model, vocab, k=10):
+    """
+    Gets the top terms of each topic of a Corex model
+    :param model: a fitted Corex model
+    :param vocab: the vocabulary the model was fitted with
+    :param k: the number of terms to return for each topic
+    :return: a DataFrame with 'topic', 'rank', 'term' and 'weight' columns; terms that don't belong
+    to a topic are left out
+    """
+    terms = top_terms(corex_weights(model), vocab, k)
+    return terms[terms['weight'] > -np.inf].reset_index(drop=True)
+
+
+def corex_coherence(model, tfidf, n_terms=10):
+    """
+    Measures the coherence of each topic of a Corex model (see qualkit.coherence)
+    :param model: a fitted Corex model
+    :param tfidf: the document-term matrix, e.g. the one the model was fitted on
+    :param n_terms: the number of top terms of each topic to use
+    :return: a DataFrame with 'topic', 'npmi' and 'umass' columns
+    """
+    indices, weights = top_indices(corex_weights(model), n_terms)
+    return topic_coherence(tfidf, [terms[topic_weights > -np.inf] for terms, topic_weights in zip(indices, weights)])
+
+
+def topic_metrics(data, column, number_of_topics=25, n_jobs=1, callback=None, min_gain=None):
     """
     Runs the model for 2-number of topics times and generates
     the total correlation (tc) to help determine how many
@@ -74,25 +123,529 @@ def topic_metrics(data, column, number_of_topics=25):
     :param data: the dataframe
     :param column: the column
     :param number_of_topics: the maximum number of topics to try
-    :return: an array of tuples of topic number and total correlation
+    :param n_jobs: the number of models to fit at the same time; -1 uses one process per CPU. The
+    TF-IDF matrix is shared with the worker processes through memory-mapped files rather than copied
+    :param callback: (optional) a function called with each result as soon as its model is fitted
+    (not necessarily in order); by default the total correlation is printed
+    :param min_gain: (optional) stop once adding a topic increases the total correlation by less than this
+    :return: an array of dicts of topic number and total correlation, in order of topic number
     """
     df = data.copy()
     vectorizer = __initialise_vectoriser__()
     vectorizer = vectorizer.fit(df[column])
     tfidf = vectorizer.transform(df[column])
-    vocab = vectorizer.get_feature_names()
+    if callback is None:
+        callback = __print_metrics__
+
+    # Create the models; the vocabulary isn't needed as it doesn't affect the total correlation
+    topic_counts = list(range(1, number_of_topics))
+    results = {}
+    last = 0
+    stopped = False
+    with tempfile.TemporaryDirectory() as directory:
+        shared = parallel.share_csr(tfidf.tocsr(), directory)
+        tasks = [(shared, i) for i in topic_counts]
+        with closing(parallel.imap_unordered(__topic_metrics__, tasks, n_jobs)) as fitted:
+            for position, result in fitted:
+                results[position] = result
+                callback(result)
+                if min_gain is None:
+                    continue
+                # check the gains for the topic counts fitted so far, in order
+                while not stopped and last in results and last + 1 in results:
+                    last += 1
+                    stopped = results[last]['tc'] - results[last - 1]['tc'] < min_gain
+                if stopped:
+                    break
+    if stopped:
+        # results for more topics than where the sweep stopped depend on timing, so leave them out
+        results = {position: result for position, result in results.items() if position <= last}
+    return [results[position] for position in sorted(results)]
+
+
+def __topic_metrics__(task):
+    shared, i = task
+    model = __model__(parallel.load_csr(shared), None, None, i, None)
+    return {"topics": i, "tc": model.tc}
+
+
+def __print_metrics__(result):
+    print("Total correlation with " + str(result['topics']) + " topics = " + str(result['tc']))
+
+
+class DocumentTermMatrix:
+    """
+    The TF-IDF document-term matrix of a set of responses, built once so that models of the whole
+    set and of any subset of it (e.g. the responses that didn't match a topic) can be fitted
+    without tokenizing the text again. The matrix is built with the full vocabulary; the min_df,
+    max_df and max_features limits of the vectorizer are applied to each subset from its own
+    column sums, just as if the vectorizer had been fitted on the subset. With the default settings,
+    which don't weight or normalise the terms, the result is identical to fitting on the subset;
+    otherwise the idf weights are those of the whole set
+    """
 
-    # Create the model
-    results = []
-    for i in range(1, number_of_topics):
-        model = __model__(tfidf, vocab, None, i, None)
-        results.append({"topics": i, "tc": model.tc})
-        print("Total correlation with " + str(i) + " topics = " + str(model.tc))
-    return results
+    def __init__(self, matrix, vocab, index, vectorizer, min_df, max_df, max_features):
+        """
+        Use from_text() rather than creating a DocumentTermMatrix directly
+        :param matrix: a CSR matrix with one row per response and one column per term
+        :param vocab: the terms, in column order
+        :param index: the index of the responses, in row order
+        :param vectorizer: the fitted vectorizer the matrix was built with
+        :param min_df: the min_df limit to apply, as for TfidfVectorizer
+        :param max_df: the max_df limit to apply, as for TfidfVectorizer
+        :param max_features: the max_features limit to apply, as for TfidfVectorizer
+        """
+        self.matrix = matrix
+        self.vocab = vocab
+        self.index = index
+        self.vectorizer = vectorizer
+        self.min_df = min_df
+        self.max_df = max_df
+        self.max_features = max_features
+
+    @classmethod
+    def from_text(cls, text, vectorizer=None):
+        """
+        Build the document-term matrix of some responses
+        :param text: a Series of the text of each response
+        :param vectorizer: (optional) an unfitted TfidfVectorizer whose settings to use; by default the
+        same settings as anchored_topic_model
+        :return: the DocumentTermMatrix
+        """
+        from sklearn.base import clone
+
+        if vectorizer is None:
+            vectorizer = __initialise_vectoriser__()
+        # keep every term, the limits are applied to each subset later
+        unlimited = clone(vectorizer).set_params(min_df=1, max_df=1.0, max_features=None)
+        matrix = unlimited.fit_transform(text).tocsr()
+        return cls(matrix, list(feature_names(unlimited)), text.index, unlimited,
+                   vectorizer.min_df, vectorizer.max_df, vectorizer.max_features)
+
+    def subset(self, index=None, min_df=None, max_df=None, max_features=None):
+        """
+        Get the rows of some of the responses, optionally with different vocabulary limits
+        :param index: (optional) the index labels of the responses to keep, e.g. data.index; by default all of them
+        :param min_df: (optional) the min_df limit to apply, as for TfidfVectorizer
+        :param max_df: (optional) the max_df limit to apply, as for TfidfVectorizer
+        :param max_features: (optional) the max_features limit to apply, as for TfidfVectorizer
+        :return: a DocumentTermMatrix of the responses
+        """
+        matrix = self.matrix
+        if index is None:
+            index = self.index
+        else:
+            positions = self.index.get_indexer(index)
+            if (positions < 0).any():
+                raise KeyError("Some of the responses are not in the document-term matrix")
+            matrix = matrix[positions]
+        return DocumentTermMatrix(matrix, self.vocab, pd.Index(index), self.vectorizer,
+                                  self.min_df if min_df is None else min_df,
+                                  self.max_df if max_df is None else max_df,
+                                  self.max_features if max_features is None else max_features)
+
+    def terms(self):
+        """
+        Apply the vocabulary limits to the matrix
+        :return: a tuple of the matrix, keeping only the columns of the terms within the limits, and those terms
+        """
+        n_documents = self.matrix.shape[0]
+        document_frequency = np.bincount(self.matrix.indices, minlength=len(self.vocab))
+        max_documents = self.max_df if isinstance(self.max_df, numbers.Integral) else self.max_df * n_documents
+        min_documents = self.min_df if isinstance(self.min_df, numbers.Integral) else self.min_df * n_documents
+        if max_documents < min_documents:
+            raise ValueError("max_df corresponds to < documents than min_df")
+
+        keep = (document_frequency >= min_documents) & (document_frequency <= max_documents)
+        if self.max_features is not None and keep.sum() > self.max_features:
+            # keep the terms with the highest total weight
+            weight = np.asarray(self.matrix.sum(axis=0)).ravel()
+            columns = np.flatnonzero(keep)
+            keep = np.zeros_like(keep)
+            keep[columns[(-weight[columns]).argsort()[:self.max_features]]] = True
+        columns = np.flatnonzero(keep)
+        if len(columns) == 0:
+            raise ValueError("After pruning, no terms remain. Try a lower min_df or a higher max_df.")
+        return self.matrix[:, columns], [self.vocab[i] for i in columns]
+
+    def vectoriser(self, vocab):
+        """
+        Get a vectorizer that turns new text into the columns of some of the terms, e.g. those from terms()
+        :param vocab: the terms
+        :return: a fitted TfidfVectorizer
+        """
+        idf = None
+        if self.vectorizer.use_idf:
+            columns = {term: i for i, term in enumerate(self.vocab)}
+            idf = self.vectorizer.idf_[[columns[term] for term in vocab]]
+        params = dict(self.vectorizer.get_params(), min_df=self.min_df, max_df=self.max_df,
+                      max_features=self.max_features)
+        return __fixed_vectoriser__(params, vocab, idf)
+
+
+def __fixed_vectoriser__(params, vocab, idf=None):
+    from sklearn.feature_extraction.text import TfidfVectorizer
+
+    # a vectorizer with a fixed vocabulary ignores the min_df, max_df and max_features limits
+    params = dict(params, vocabulary={term: i for i, term in enumerate(vocab)})
+    vectorizer = TfidfVectorizer(**params).fit(vocab)
+    if idf is not None:
+        vectorizer.idf_ = idf
+    return vectorizer
+
+
+def anchor_search(data, column, anchor_sets, strengths=(1, 2, 3, 5), n_jobs=1, number_of_topics=None,
+                  cache=None, callback=None, document_terms=None):
+    """
+    Fits a model for every combination of a set of anchors and an anchor strength, to help choose
+    between them. The text is vectorised only once, and the TF-IDF matrix is shared with the
+    worker processes through memory-mapped files rather than copied
+    :param data: the dataframe
+    :param column: the column
+    :param anchor_sets: a list of anchor sets to try, each a list containing lists of anchor terms, or a dict
+    of them keyed by name
+    :param strengths: the anchor strengths to try with each anchor set
+    :param n_jobs: the number of models to fit at the same time; -1 uses one process per CPU
+    :param number_of_topics: (optional) the number of topics for every model; by default, the number of
+    lists of anchor terms in the anchor set
+    :param cache: (optional) a TransformCache to keep each result in as soon as its model is fitted, so a
+    search that is interrupted, or repeated with more anchor sets or strengths, only fits the new models
+    :param callback: (optional) a function called with each result as it is ready (not necessarily in
+    order), including those found in the cache; by default a summary is printed
+    :param document_terms: (optional) a DocumentTermMatrix containing the rows of data, to use instead of
+    tokenizing the text again
+    :return: a list of dicts, one per combination in the order of anchor_sets then strengths, with
+    'anchor_set' (the name or position of the anchor set), 'anchor_strength', the total correlation
+    ('tc'), the total correlation of each topic ('tcs'), the fraction of documents that match no topic
+    ('unmatched') and 'fit_time' (in seconds)
+    """
+    if document_terms is None:
+        vectorizer = __initialise_vectoriser__()
+        tfidf = vectorizer.fit_transform(data[column]).tocsr()
+        vocab = list(feature_names(vectorizer))
+    else:
+        tfidf, vocab = document_terms.subset(data.index).terms()
+    if callback is None:
+        callback = __print_anchor_search__
+    if not isinstance(anchor_sets, dict):
+        anchor_sets = dict(enumerate(anchor_sets))
+
+    # The anchors are passed to the models as column numbers, so the vocabulary isn't needed
+    columns = {term: i for i, term in enumerate(vocab)}
+    config = config_hash('anchor_search', __matrix_hash__(tfidf, vocab))
+    tasks = []
+    for name, anchors in anchor_sets.items():
+        anchors = [[columns[a] for a in topic if a in columns] for topic in anchors]
+        topics = len(anchors) if number_of_topics is None else number_of_topics
+        for strength in strengths:
+            key = TransformCache.key(config, json.dumps([topics, strength, anchors]))
+            tasks.append(({'anchor_set': name, 'anchor_strength': strength}, key, (topics, anchors, strength)))
+
+    results = {}
+    if cache is not None:
+        found = cache.get_many([key for _, key, _ in tasks])
+        for position, (result, key, _) in enumerate(tasks):
+            if key in found:
+                results[position] = dict(result, **found[key])
+                callback(results[position])
+    remaining = [position for position in range(len(tasks)) if position not in results]
+
+    if remaining:
+        with tempfile.TemporaryDirectory() as directory:
+            shared = parallel.share_csr(tfidf, directory)
+            fits = [(shared,) + tasks[position][2] for position in remaining]
+            with closing(parallel.imap_unordered(__anchor_search_fit__, fits, n_jobs)) as fitted:
+                for i, metrics in fitted:
+                    position = remaining[i]
+                    result, key, _ = tasks[position]
+                    if cache is not None:
+                        cache.put_many({key: metrics})
+                    results[position] = dict(result, **metrics)
+                    callback(results[position])
+    return [results[position] for position in range(len(tasks))]
+
+
+def __anchor_search_fit__(task):
+    from corextopic import corextopic as ct
+
+    shared, topics, anchors, strength = task
+    start = time.time()
+    model = ct.Corex(n_hidden=topics, seed=42).fit(parallel.load_csr(shared), anchors=anchors,
+                                                   anchor_strength=strength)
+    labels = np.reshape(model.labels, (len(model.labels), -1))
+    return {
+        'tc': float(model.tc),
+        'tcs': np.asarray(model.tcs, dtype=float).tolist(),
+        'unmatched': float(np.mean(~labels.any(axis=1))),
+        'fit_time': time.time() - start
+    }
+
+
+def __matrix_hash__(matrix, vocab):
+    # identifies the vectorised text, so cached results are only used for the same responses
+    digest = hashlib.sha256(json.dumps(list(vocab)).encode('utf-8'))
+    for array in (matrix.indptr, matrix.indices, matrix.data):
+        digest.update(np.ascontiguousarray(array).tobytes())
+    return digest.hexdigest()
+
+
+def __print_anchor_search__(result):
+    print("Anchor set {} with strength {}: total correlation = {}, unmatched = {:.1%}".format(
+        result['anchor_set'], result['anchor_strength'], result['tc'], result['unmatched']))
+
+
+# The fitted Corex arrays needed to label new documents and rank topic terms
+__COREX_ARRAYS__ = ('alpha', 'theta', 'lp0', 'px_frac', 'log_p_y', 'tcs', 'mis')
+
+
+class AnchoredTopicModel:
+    """
+    An anchored Corex topic model that is fitted once and can then label any number of new
+    responses without retraining. A fitted model, including its vocabulary and its topic labels
+    and names, can be saved to a directory and loaded again later; the model's arrays are
+    memory-mapped when it is loaded
+    """
+
+    def __init__(self, topic_filename=None, topic_names=None, anchors=None, number_of_topics=10,
+                 anchor_strength_int=2, label_terms=10, probability_dtype='float64'):
+        """
+        :param topic_filename: (optional) the name of a file containing anchor terms and topic names
+        :param topic_names: (optional) a List of topic names
+        :param anchors: (optional) a list containing lists of anchor terms
+        :param number_of_topics: defaults to 10; the number of topics to generate (overridden if topics are supplied)
+        :param anchor_strength_int: defaults to 2; tells the model how much it should rely on the anchors
+        :param label_terms: defaults to 10; the maximum number of terms in each topic label
+        :param probability_dtype: defaults to 'float64'; the dtype of the topic probability columns of the results,
+        'float32' halves their size
+        """
+        # Load topics from file if provided
+        if topic_filename is not None:
+            tf = load_topics(topic_filename)
+            topic_names = tf['topic_name'].tolist()
+            anchors = tf['anchors'].tolist()
+
+        # Calculate number of topics based on provided anchors if supplied
+        if anchors is not None:
+            number_of_topics = len(anchors)
+            if topic_names is not None:
+                if len(topic_names) != len(anchors):
+                    raise ValueError("Topic names and anchors must be the same length")
+                topic_names = ['No matching topic'] + list(topic_names)
+
+        self.anchors = anchors
+        self.number_of_topics = number_of_topics
+        self.anchor_strength_int = anchor_strength_int
+        self.label_terms = label_terms
+        self.probability_dtype = np.dtype(probability_dtype)
+        self.topic_names = None if topic_names is None else list(topic_names)
+        self.topic_labels = None
+        self.vectorizer = None
+        self.vocab = None
+        self.model = None
+
+    def fit(self, data, column, document_terms=None, sample_size=None, random_state=42):
+        """
+        Fit the vectorizer and the Corex model
+        :param data: a DataFrame containing a column with text to analyse
+        :param column: the name of the column containing the text
+        :param document_terms: (optional) a DocumentTermMatrix containing the rows of data, to use instead of
+        tokenizing the text again
+        :param sample_size: (optional) fit on a random sample of this many rows rather than all of them
+        :param random_state: the seed used to choose the sample, so the same rows are chosen every time
+        :return: the model
+        """
+        if sample_size is not None and sample_size < len(data):
+            rows = np.random.RandomState(random_state).choice(len(data), sample_size, replace=False)
+            # keep the sampled rows in their original order
+            data = data.iloc[np.sort(rows)]
+        self.__fit__(data, column, document_terms)
+        return self
+
+    def transform(self, data, column, document_terms=None) -> pd.DataFrame:
+        """
+        Label responses with the fitted topics
+        :param data: a DataFrame containing a column with text to analyse
+        :param column: the name of the column containing the text
+        :param document_terms: (optional) a DocumentTermMatrix containing the rows of data, to use instead of
+        tokenizing the text again
+        :return: a DataFrame containing the original data supplied along with the 'topic label' and 'topic name'
+        for each row
+        """
+        return self.__results__(data, *self.__latent__(self.__vectorise__(data, column, document_terms)))
+
+    def transform_chunks(self, data, column, chunksize, document_terms=None):
+        """
+        Label responses with the fitted topics a chunk of rows at a time, so the memory needed for
+        the results of each chunk depends on the chunk size rather than the number of responses
+        :param data: a DataFrame containing a column with text to analyse
+        :param column: the name of the column containing the text
+        :param chunksize: the number of rows to label at a time
+        :param document_terms: (optional) a DocumentTermMatrix containing the rows of data, to use instead of
+        tokenizing the text again
+        :return: a generator of DataFrames, as returned by transform, one for each chunk of rows in order
+        """
+        for start in range(0, len(data), chunksize):
+            yield self.transform(data.iloc[start:start + chunksize], column, document_terms)
+
+    def fit_transform(self, data, column, document_terms=None) -> pd.DataFrame:
+        """
+        Fit the model and label the responses it was fitted on
+        :param data: a DataFrame containing a column with text to analyse
+        :param column: the name of the column containing the text
+        :param document_terms: (optional) a DocumentTermMatrix containing the rows of data, to use instead of
+        tokenizing the text again
+        :return: as for transform
+        """
+        self.__fit__(data, column, document_terms)
+        # Corex has already worked out the topics of the responses it was fitted on
+        return self.__results__(data, self.model.p_y_given_x, self.model.log_p_y_given_x)
+
+    def print_topic_details(self):
+        """
+        Print a summary of the topics to the console
+        """
+        print("Total correlation: " + str(self.model.tc))
+        for i, topic_label in enumerate(self.topic_labels[1:]):
+            print("Topic #{}: {}".format(i + 1, topic_label))
+
+    def save(self, path):
+        """
+        Save the fitted model to a directory, which is created if necessary
+        :param path: the directory
+        """
+        os.makedirs(path, exist_ok=True)
+        vectorizer_params = self.vectorizer.get_params()
+        vectorizer_params['dtype'] = np.dtype(vectorizer_params['dtype']).name
+        vectorizer_params['vocabulary'] = None
+        params = {
+            'anchors': None if self.anchors is None else [list(topic) for topic in self.anchors],
+            'number_of_topics': self.number_of_topics,
+            'anchor_strength_int': self.anchor_strength_int,
+            'label_terms': self.label_terms,
+            'probability_dtype': self.probability_dtype.name,
+            'topic_names': self.topic_names,
+            'topic_labels': self.topic_labels,
+            'vectorizer': vectorizer_params,
+            'corex': {'count': self.model.count},
+        }
+        with open(os.path.join(path, 'params.json'), 'w') as f:
+            json.dump(params, f)
+        with open(os.path.join(path, 'vocabulary.json'), 'w') as f:
+            json.dump(list(self.vocab), f)
+        for name in __COREX_ARRAYS__:
+            np.save(os.path.join(path, name + '.npy'), getattr(self.model, name))
+        if hasattr(self.vectorizer, 'idf_') and self.vectorizer.use_idf:
+            np.save(os.path.join(path, 'idf.npy'), self.vectorizer.idf_)
+
+    @classmethod
+    def load(cls, path, mmap_mode='r'):
+        """
+        Load a model saved with save()
+        :param path: the directory the model was saved to
+        :param mmap_mode: how to memory-map the arrays (see numpy.load); None reads them into memory
+        :return: the model
+        """
+        from corextopic import corextopic as ct
+
+        with open(os.path.join(path, 'params.json')) as f:
+            params = json.load(f)
+        with open(os.path.join(path, 'vocabulary.json')) as f:
+            vocab = json.load(f)
+
+        model = cls(anchors=params['anchors'], number_of_topics=params['number_of_topics'],
+                    anchor_strength_int=params['anchor_strength_int'], label_terms=params['label_terms'],
+                    probability_dtype=params['probability_dtype'])
+        model.topic_names = params['topic_names']
+        model.topic_labels = params['topic_labels']
+        model.vocab = vocab
+
+        # rebuild the vectorizer around the saved vocabulary
+        vectorizer_params = params['vectorizer']
+        vectorizer_params['dtype'] = np.dtype(vectorizer_params['dtype']).type
+        vectorizer_params['ngram_range'] = tuple(vectorizer_params['ngram_range'])
+        idf = None
+        if os.path.exists(os.path.join(path, 'idf.npy')):
+            idf = np.load(os.path.join(path, 'idf.npy'))
+        model.vectorizer = __fixed_vectoriser__(vectorizer_params, vocab, idf)
+
+        # restore the fitted state that Corex needs to label new documents
+        model.model = ct.Corex(n_hidden=params['number_of_topics'], seed=42, count=params['corex']['count'])
+        for name in __COREX_ARRAYS__:
+            setattr(model.model, name, np.load(os.path.join(path, name + '.npy'), mmap_mode=mmap_mode))
+        model.model.words = vocab
+        model.model.col_index2word = dict(enumerate(vocab))
+        model.model.word2col_index = {word: i for i, word in enumerate(vocab)}
+        return model
+
+    def __fit__(self, data, column, document_terms):
+        if document_terms is None:
+            # Initialise the vectorizer that will split the text into tokens
+            # uses the TFIDF algorithm
+            self.vectorizer = __initialise_vectoriser__()
+            self.vectorizer = self.vectorizer.fit(data[column])
+            tfidf = self.vectorizer.transform(data[column])
+            self.vocab = list(feature_names(self.vectorizer))
+        else:
+            tfidf, self.vocab = document_terms.subset(data.index).terms()
+            self.vectorizer = document_terms.vectoriser(self.vocab)
+
+        # Create the model
+        self.model = __model__(tfidf, self.vocab, self.anchors, self.number_of_topics, self.anchor_strength_int)
+
+        # Enumerate the topics from the model and create labels
+        self.topic_labels = ['No matching topic']
+        vocab_array = np.asarray(self.vocab, dtype=object)
+        indices, weights = top_indices(corex_weights(self.model), self.label_terms)
+        for topic_ngrams, topic_weights in zip(indices, weights):
+            self.topic_labels.append(", ".join(vocab_array[topic_ngrams[topic_weights > 0]]))
+
+    def __vectorise__(self, data, column, document_terms):
+        if document_terms is not None:
+            columns = pd.Index(document_terms.vocab).get_indexer(self.vocab)
+            # the model may have been fitted on other responses, with terms the matrix doesn't have
+            if (columns >= 0).all():
+                return document_terms.subset(data.index).matrix[:, columns]
+        return self.vectorizer.transform(data[column])
+
+    def __latent__(self, tfidf):
+        # Apply the model to the documents
+        p_y_given_x, log_p_y_given_x, _ = self.model.calculate_latent(self.model.preprocess(tfidf), self.model.theta)
+        return p_y_given_x, log_p_y_given_x
+
+    def __results__(self, data, p_y_given_x, log_p_y_given_x):
+        topics = range(1, self.number_of_topics + 1)
+        topic_names = self.topic_names if self.topic_names is not None else self.topic_labels
+
+        doc_topics = self.model.label(p_y_given_x)
+
+        # get the dominant topic for each document, the first one it matches, or 0 ('no topic') if unmatched
+        dominant_topic = np.where(doc_topics.any(axis=1), np.argmax(doc_topics, axis=1) + 1, 0)
+
+        # join the results back to the original dataframe and return
+        return pd.concat([
+            data,
+            pd.DataFrame(doc_topics, columns=["topic_{}".format(i) for i in topics], index=data.index),
+            pd.DataFrame({
+                'Topic label': __categorical__(self.topic_labels, dominant_topic),
+                'Topic name': __categorical__(topic_names, dominant_topic),
+            }, index=data.index),
+            # JC added: Probability a document belongs to a topic given that document's words
+            pd.DataFrame(log_p_y_given_x.astype(self.probability_dtype, copy=False),
+                         columns=["topic_probability_{}".format(i) for i in topics], index=data.index),
+        ], axis=1)
+
+
+def __categorical__(values, codes):
+    # values[codes] as a Categorical, without looking up each row in Python; factorize keeps the
+    # categories in topic order, merges duplicates and doesn't need the values to be sortable
+    positions, categories = pd.factorize(np.asarray(values, dtype=object))
+    return pd.Categorical.from_codes(np.take(positions, codes), categories)
 
 
 def anchored_topic_model(data, column, topic_filename=None, topic_names=None, anchors=None, number_of_topics=10,
-                         print_topic_details=False, anchor_strength_int=2):
+                         print_topic_details=False, anchor_strength_int=2, label_terms=10, document_terms=None,
+                         fit_sample_size=None, transform_chunksize=None, output_file=None, random_state=42,
+                         probability_dtype='float64'):
     """
     Creates a topic model using the Corex algorithm using an optional set of user-provided anchors
     :param data: a DataFrame containing a column with text to analyse
@@ -103,107 +656,43 @@ def anchored_topic_model(data, column, topic_filename=None, topic_names=None, an
     :param number_of_topics: defaults to 10; the number of topics to generate (overridden if topics are supplied)
     :param print_topic_details: if true, print to console a summary of the generated topics
     :param anchor_strength_int: defaults to 2; tells the model how much it should rely on the anchors
-    :return:a DataFrame containing the original data supplied along with the 'topic label' and 'topic name' for each row
+    :param label_terms: defaults to 10; the maximum number of terms in each topic label
+    :param document_terms: (optional) a DocumentTermMatrix containing the rows of data, e.g. one built from a
+    larger set of responses that data is a subset of, to use instead of tokenizing the text again
+    :param fit_sample_size: (optional) fit the model on a random sample of this many rows, then label every row
+    :param transform_chunksize: (optional) label this many rows at a time, to limit the memory used
+    :param output_file: (optional) the path of a CSV file to write the results to, one chunk at a time as each is
+    labelled, rather than returning them
+    :param random_state: defaults to 42; the seed used to choose the sample when fit_sample_size is set
+    :param probability_dtype: defaults to 'float64'; the dtype of the topic probability columns, 'float32' halves
+    their size
+    :return:a DataFrame containing the original data supplied along with the 'topic label' and 'topic name' for each
+    row, or the number of rows written if output_file is set
     """
-
-    # Load topics from file if provided
-    if topic_filename is not None:
-        tf = load_topics(topic_filename)
-        topic_names = tf['topic_name']
-        anchors = tf['anchors']
-
-    df = data.copy()
-
-    # Calculate number of topics based on provided anchors if supplied
-    if anchors is not None:
-        number_of_topics = len(anchors)
-        if topic_names is not None:
-            if len(topic_names) != len(anchors):
-                print("Topic names and anchors must be the same length")
-                return None
-            topic_names = ['No matching topic']+topic_names
-
-    # Initialise the vectorizer that will split the text into tokens
-    # uses the TFIDF algorithm
-    vectorizer = __initialise_vectoriser__()
-    vectorizer = vectorizer.fit(df[column])
-    tfidf = vectorizer.transform(df[column])
-    vocab = vectorizer.get_feature_names()
-
-    # Create the model
-    model = __model__(tfidf, vocab, anchors, number_of_topics, anchor_strength_int)
-
-    # Enumerate the topics from the model and create labels
-    topic_labels = ['No matching topic']
-    if print_topic_details:
-        print("Total correlation: " + str(model.tc))
-    for i, topic_ngrams in enumerate(model.get_topics(n_words=10)):
-        topic_ngrams = [ngram[0] for ngram in topic_ngrams if ngram[1] > 0]
-        topic_label = ", ".join(topic_ngrams)
-        topic_labels.append(topic_label)
+    try:
+        model = AnchoredTopicModel(topic_filename, topic_names, anchors, number_of_topics, anchor_strength_int,
+                                   label_terms, probability_dtype)
+    except ValueError as e:
+        print(e)
+        return None
+
+    if fit_sample_size is None and transform_chunksize is None and output_file is None:
+        results = model.fit_transform(data, column, document_terms)
         if print_topic_details:
-            print("Topic #{}: {}".format(i + 1, topic_label))
-    if topic_names is None:
-        topic_names = topic_labels
-
-    # Apply the model to the documents
-    doc_topics = model.transform(tfidf)
-    topic_matrix = pd.DataFrame(
-        doc_topics,
-        columns=["topic_{}".format(i) for i in range(1, number_of_topics + 1)],
-        index=df.index,
-    )
-
-
-    # Add columns for each topic
-    topic_cols = ["topic_" + str(i) for i in range(1, number_of_topics + 1)]
-    df_document_topic = pd.DataFrame(topic_matrix, columns=topic_cols)
-    df_document_topic.insert(0, 'no topic', False, True)
-
-
-    # get the dominant topic for each document, or 'no topic' if unmatched
-    dominant_topic = (np.argmax(df_document_topic.values, axis=1)) # In case of multiple occurrences of the maximum values, the indices corresponding to the first occurrence are returned.
-
-    df_document_topic['Dominant_topic'] = dominant_topic
-    df_document_topic['Topic label'] = df_document_topic['Dominant_topic'].apply(lambda x: topic_labels[x])
-    df_document_topic['Topic name'] = df_document_topic['Dominant_topic'].apply(lambda x: topic_names[x])
-
-
-
-   # JC added: Probability a document belongs to a topic given that document's words
-
-    doc_topic_probability = model.log_p_y_given_x
-
-    topic_probability_matrix = pd.DataFrame(
-        doc_topic_probability,
-        columns=["topic_probability_{}".format(i) for i in range(1, number_of_topics + 1)],
-        index=df.index,
-    )
-    # Add column for probability for each topic
-
-    topic_probability_cols = ["topic_probability_" + str(i) for i in range(1, number_of_topics + 1)]
-    df_document_topic_probability = pd.DataFrame(topic_probability_matrix, columns=topic_probability_cols)
-
-
-    # 2nd dominant topic
-
-    #second_topic = np.argsort(np.argmax(df_document_topic.values, axis=1))[1]
-    #df_document_topic['Second_topic'] = second_topic
-    #df_document_topic['Second label'] = df_document_topic['Second_topic'].apply(lambda x: topic_labels[x])
-    #df_document_topic['Second Topic name'] = df_document_topic['Second_topic'].apply(lambda x: topic_names[x])
-
-# remove the individual columns for topics
-    # df_document_topic.drop(columns=topic_cols, inplace=True, axis=1)
-    # topic_matrix.drop(columns=topic_cols, inplace=True, axis=1)
-
-    # join the results back to the original dataframe and return
-    topic_matrix = pd.merge(topic_matrix, df_document_topic[['Topic label', 'Topic name']],
-                            left_index=True, right_index=True, how='outer')
-    results = pd.merge(df, topic_matrix, left_index=True, right_index=True, how='outer')
-
-    # Topic probability to original
-    results = pd.merge(results, df_document_topic_probability, left_index=True, right_index=True, how='outer')
-
-    return results
-
+            model.print_topic_details()
+        return results
 
+    model.fit(data, column, document_terms, fit_sample_size, random_state)
+    if print_topic_details:
+        model.print_topic_details()
+    chunks = model.transform_chunks(data, column, transform_chunksize or max(len(data), 1), document_terms)
+    if output_file is None:
+        return pd.concat(chunks)
+
+    rows = 0
+    first = True
+    for df in chunks:
+        df.to_csv(output_file, mode='w' if first else 'a', header=first)
+        first = False
+        rows += len(df)
+    return rows
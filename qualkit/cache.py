@@ -0,0 +1,192 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+# SQLite limits the number of parameters in a single statement
+__BATCH__ = 500
+
+
+def qualkit_version():
+    """
+    :return: the installed version of qualkit, or 'unknown' if it isn't installed
+    """
+    try:
+        from importlib.metadata import version, PackageNotFoundError
+    except ImportError:
+        return 'unknown'
+    try:
+        return version('qualkit')
+    except PackageNotFoundError:
+        return 'unknown'
+
+
+def config_hash(name, *parts):
+    """
+    Hash the configuration of a transform, so that results cached under one configuration
+    are never returned for another. The qualkit version is always included
+    :param name: the name of the transform
+    :param parts: anything else the results depend on, e.g. term lists; must be JSON serialisable
+    (other values are converted with str())
+    :return: a hex digest
+    """
+    payload = json.dumps([name, qualkit_version(), parts], default=str, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class TransformCache:
+    """
+    A persistent cache of transformed text, stored in a SQLite database in a directory of
+    your choice. Entries are keyed by a hash of the input text and a hash of the transform
+    configuration, so re-running a pipeline over a mostly unchanged export only computes
+    the new or changed responses. When max_size is set, the least recently used entries
+    are evicted to keep the database under that many bytes of data
+    """
+
+    def __init__(self, directory, max_size=None, filename='qualkit_cache.sqlite'):
+        """
+        :param directory: the directory to keep the cache in; created if it doesn't exist
+        :param max_size: (optional) the maximum size of the cached data in bytes
+        :param filename: the name of the database file
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, filename)
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.__lock = threading.Lock()
+        self.__connection = sqlite3.connect(self.path, check_same_thread=False)
+        with self.__connection:
+            self.__connection.execute(
+                'CREATE TABLE IF NOT EXISTS entries '
+                '(key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, accessed REAL NOT NULL)'
+            )
+            self.__connection.execute('CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)')
+
+    @staticmethod
+    def key(config, text):
+        """
+        :param config: a configuration hash from config_hash
+        :param text: the input value
+        :return: the cache key for the value under the configuration
+        """
+        return hashlib.sha256((config + '\0' + str(text)).encode('utf-8')).hexdigest()
+
+    def get_many(self, keys):
+        """
+        Look up several keys at once, counting hits and misses
+        :param keys: a list of keys
+        :return: a dict of the keys that were found and their values
+        """
+        found = {}
+        now = time.time()
+        with self.__lock, self.__connection:
+            for start in range(0, len(keys), __BATCH__):
+                batch = keys[start:start + __BATCH__]
+                placeholders = ','.join('?' * len(batch))
+                rows = self.__connection.execute(
+                    'SELECT key, value FROM entries WHERE key IN ({})'.format(placeholders), batch
+                ).fetchall()
+                found.update((key, json.loads(value)) for key, value in rows)
+                self.__connection.execute(
+                    'UPDATE entries SET accessed = ? WHERE key IN ({})'.format(placeholders), [now] + batch
+                )
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def put_many(self, items):
+        """
+        Store several values at once, then evict old entries if the cache is too big
+        :param items: a dict of keys and JSON-serialisable values
+        """
+        now = time.time()
+        rows = []
+        for key, value in items.items():
+            value = json.dumps(value)
+            rows.append((key, value, len(key) + len(value), now))
+        with self.__lock, self.__connection:
+            self.__connection.executemany(
+                'INSERT OR REPLACE INTO entries (key, value, size, accessed) VALUES (?, ?, ?, ?)', rows
+            )
+            if self.max_size is not None:
+                self.__evict()
+
+    def __evict(self):
+        total = self.__connection.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+        if total <= self.max_size:
+            return
+        excess = total - self.max_size
+        removed = 0
+        victims = []
+        for key, size in self.__connection.execute('SELECT key, size FROM entries ORDER BY accessed'):
+            victims.append((key,))
+            removed += size
+            if removed >= excess:
+                break
+        self.__connection.executemany('DELETE FROM entries WHERE key = ?', victims)
+
+    def stats(self):
+        """
+        :return: a dict with the hits and misses since the cache was opened, the hit rate,
+        and the number of entries and bytes of data stored
+        """
+        with self.__lock:
+            entries, size = self.__connection.execute(
+                'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries'
+            ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'entries': entries,
+            'size': size
+        }
+
+    def clear(self):
+        """
+        Remove every entry and reset the statistics
+        """
+        with self.__lock, self.__connection:
+            self.__connection.execute('DELETE FROM entries')
+        self.hits = 0
+        self.misses = 0
+
+    def close(self):
+        self.__connection.close()
+
+
+def map_cached(series, func, cache, config, batch=False) -> pd.Series:
+    """
+    Apply a function to each distinct value of a Series, taking results from the cache where
+    possible and storing any new results in it
+    :param series: the Series
+    :param func: a function taking a single value
+    :param cache: a TransformCache
+    :param config: a configuration hash from config_hash, describing func
+    :param batch: if True, func is instead called once with a list of the values not in the cache
+    and returns a list of results
+    :return: a Series of results with the same index; missing values stay missing
+    """
+    codes, uniques = pd.factorize(series)
+    uniques = list(uniques)
+    keys = [cache.key(config, value) for value in uniques]
+    found = cache.get_many(keys)
+    missing = [i for i, key in enumerate(keys) if key not in found]
+    if missing:
+        values = [uniques[i] for i in missing]
+        computed = func(values) if batch else [func(value) for value in values]
+        new = {keys[i]: result for i, result in zip(missing, computed)}
+        cache.put_many(new)
+        found.update(new)
+    results = np.empty(len(uniques) + 1, dtype=object)
+    results[:-1] = [found[key] for key in keys]
+    # missing values have a code of -1, which picks up the np.nan at the end
+    results[-1] = np.nan
+    return pd.Series(results[codes], index=series.index, name=series.name).infer_objects()
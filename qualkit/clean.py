@@ -1,88 +1,354 @@
 import re
+from functools import lru_cache
 import numpy as np
 import pandas as pd
 from nltk.corpus import wordnet
+from nltk.corpus.reader.wordnet import ADJ, VERB, NOUN, ADV
 from nltk.stem import WordNetLemmatizer
 from nltk import word_tokenize
+from nltk.tag import PerceptronTagger
 import nltk
 #For loading lists
 import os
 import sys
+import threading
 
+from qualkit import parallel
+from qualkit.cache import config_hash, map_cached
+from qualkit.resources import require
 
-nltk.download('wordnet')
-nltk.download('punkt')
-nltk.download('averaged_perceptron_tagger')
-nltk.download('omw-1.4')
 
 wordnet_lemmatizer = WordNetLemmatizer()
 
+# The number of strings remembered by lemmatize_string
+LEMMATIZE_CACHE_SIZE = 100000
+
+# The number of strings part-of-speech tagged at a time by lemmatize
+LEMMATIZE_BATCH_SIZE = 10000
+
+# Domain terms and their generic replacements
+ONETOONE = ['1 2 1', '1 on 1', '1 to 1', '1-1', '1on1', '1:1', '1to1']
+
+ONLINE = ['online learning', 'learning online',
+          'learn online', 'teaching online',
+          'online teaching', 'online courses', 'online course',
+          'online classes'
+          'online class', 'online lessons', 'online lesson',
+          'online lectures', 'online lecture'
+          ]
+
+ONLINE_LEARNING_PLATFORM = ['blackboard', 'moodle', 'canvas']
+
+ONLINE_MEETING_TOOL = ['zoom', 'blackboard collaborate', 'microsoft teams', 'ms teams', 'microsoft team', 'ms team',
+                       'big blue button']
+
+# 'Don't know' and its synonyms, in the order they are replaced
+DONT_KNOW_TERMS = [
+    ['i honestly dont know', "im dont know", "i m dont know", "i really dont know", "i dont really know",
+     "i dont know really", "i dont know sorry", "sorry i dont know", "i dont know mate", "i dont know",
+     "i don t know", "i do not know", "dont really know", "dont know", "i dunno", "dunno", "don t know", "idk",
+     "do not know", 'i do nt know', 'do nt know', 'do nt know', 'i dont know to be honest',
+     'i do nt think there be anything', 'i do nt even know'],
+    ['i am not really sure', 'im not too sure', 'im not really sure', 'not really sure', "i have no idea",
+     "i am not sure", "im not sure", "i m not sure", "im unsure", "unsure", "not sure", "not too sure",
+     "no idea", "not a clue", "no clue", 'do nt understand'],
+    ["no comments", "no comment", "no opinion", "n a", "na", "none", "unknown", "no answer", 'not applicable',
+     'nil', 'no'],
+    ['i cant think of anything', 'cant think of anything', 'i ca nt say', 'ca nt think of anything',
+     'i ca nt think of any', 'ca nt think of any']
+]
+
+__NON_ALPHA__ = re.compile(r'[^a-z]')
+__NON_ALPHA_ASCII__ = bytes(c if ord('a') <= c <= ord('z') else ord(' ') for c in range(256))
+
+
+# WordNet POS for the first letter of each Penn Treebank tag
+__WORDNET_POS__ = {'J': ADJ, 'V': VERB, 'N': NOUN, 'R': ADV}
+
 
 def __get_wordnet_pos__(treebank_tag):
     """
     return WORDNET POS compliance to WORDNET lemmatization (a,n,r,v)
     """
-    if treebank_tag.startswith('J'):
-        return wordnet.ADJ
-    elif treebank_tag.startswith('V'):
-        return wordnet.VERB
-    elif treebank_tag.startswith('N'):
-        return wordnet.NOUN
-    elif treebank_tag.startswith('R'):
-        return wordnet.ADV
-    else:
-        # As default pos in lemmatization is Noun
-        return wordnet.NOUN
+    # As default pos in lemmatization is Noun
+    return __WORDNET_POS__.get(treebank_tag[:1], NOUN)
+
+
+@lru_cache(maxsize=None)
+def __tagger__():
+    # the tagger is loaded once per process and shared by everything that needs it
+    require('averaged_perceptron_tagger')
+    return PerceptronTagger()
+
+
+def __require_lemmatize_resources__():
+    for name in ('punkt', 'wordnet', 'omw-1.4'):
+        require(name)
+
+
+@lru_cache(maxsize=LEMMATIZE_CACHE_SIZE)
+def __lemma__(word, pos):
+    return wordnet_lemmatizer.lemmatize(word, pos)
+
+
+def __lemmatize_tagged__(pos_tokens):
+    return ' '.join([__lemma__(word, __WORDNET_POS__.get(tag[:1], NOUN)) for word, tag in pos_tokens])
+
+
+def __lemmatize__(text):
+    __require_lemmatize_resources__()
+    tokens = word_tokenize(text)
+    return __lemmatize_tagged__(__tagger__().tag(tokens))
+
+
+__lemmatize_cached__ = lru_cache(maxsize=LEMMATIZE_CACHE_SIZE)(__lemmatize__)
+
+
+def set_lemmatize_cache_size(maxsize):
+    """
+    Change the size of the memo used by lemmatize_string. This also empties the memo
+    :param maxsize: the number of strings to remember; 0 disables the memo and None makes it unbounded
+    """
+    global __lemmatize_cached__
+    __lemmatize_cached__ = lru_cache(maxsize=maxsize)(__lemmatize__)
 
 
 def lemmatize_string(text):
     """
-    Lemmatize a single string by tokenising and then reassembling it
+    Lemmatize a single string by tokenising and then reassembling it. Results are
+    remembered in a least-recently-used memo (see set_lemmatize_cache_size)
     :param text: the string to lemmatize
     :return: the lemmatized string
     """
-    tokens = word_tokenize(text)
-    pos_tokens = nltk.pos_tag(tokens)
+    return __lemmatize_cached__(text)
+
+
+def lemmatize_strings(texts, batch_size=LEMMATIZE_BATCH_SIZE, n_jobs=1, chunksize=None, executor=None):
+    """
+    Lemmatize a list of strings. The strings are tokenised and then part-of-speech tagged
+    in batches, which avoids the per-call overhead of tagging each string separately
+    :param texts: a list of strings
+    :param batch_size: the number of strings to tag at a time
+    :param n_jobs: the number of worker processes to use; -1 uses one per CPU
+    :param chunksize: (optional) the number of strings sent to a worker at a time; by default
+    the list is shared evenly between the workers, in chunks of at most batch_size strings
+    :param executor: (optional) a pool of workers from lemmatize_pool() to use instead of starting new ones
+    :return: a list of lemmatized strings, in the same order as texts
+    """
+    n_jobs = parallel.effective_n_jobs(n_jobs)
+    if n_jobs > 1:
+        if chunksize is None:
+            chunksize = parallel.default_chunksize(len(texts), n_jobs, batch_size)
+        chunks = parallel.split(list(texts), chunksize)
+        results = parallel.map_chunks(__lemmatize_chunk__, chunks, n_jobs, initializer=__init_lemmatize_worker__,
+                                      executor=executor)
+        return [text for chunk in results for text in chunk]
+
+    __require_lemmatize_resources__()
     output = []
-    for token in pos_tokens:
-        output.append(wordnet_lemmatizer.lemmatize(token[0], __get_wordnet_pos__(token[1])))
-    return ' '.join(output)
+    for start in range(0, len(texts), batch_size):
+        token_lists = [word_tokenize(text) for text in texts[start:start + batch_size]]
+        output.extend([__lemmatize_tagged__(pos_tokens) for pos_tokens in __tagger__().tag_sents(token_lists)])
+    return output
+
+
+def lemmatize_pool(n_jobs):
+    """
+    Start a pool of workers for lemmatizing, to share between several calls to lemmatize (e.g. one
+    for each chunk of a large file) so the workers and their tagger are only loaded once
+    :param n_jobs: the number of worker processes; -1 uses one per CPU
+    :return: a context manager giving the pool, or None if n_jobs is 1
+    """
+    return parallel.pool(n_jobs, initializer=__init_lemmatize_worker__)
+
+
+def __init_lemmatize_worker__():
+    # load the tagger and WordNet once when each worker starts
+    __require_lemmatize_resources__()
+    __tagger__()
+    wordnet.ensure_loaded()
 
 
-def lemmatize(data, columns):
+def __lemmatize_chunk__(texts):
+    return lemmatize_strings(texts)
+
+
+def lemmatize(data, columns, dedupe=False, n_jobs=1, chunksize=None, dtype=None, cache=None, executor=None):
     """
     Lemmatize the content of a specific column in a DataFrame
     :param data: the DataFrame
     :param columns: a single column name or list of column names
+    :param dedupe: if True, lemmatize each distinct value only once
+    :param n_jobs: the number of worker processes to use; -1 uses one per CPU
+    :param chunksize: (optional) the number of strings sent to a worker at a time
+    :param dtype: (optional) the dtype of the lemmatized columns, e.g. 'string[pyarrow]'; by default
+    columns with a pandas string dtype keep it and other columns are returned as objects
+    :param cache: (optional) a TransformCache; only values not already in the cache are lemmatized
+    :param executor: (optional) a pool of workers from lemmatize_pool() to use instead of starting new ones
     :return: the modified DataFrame
     """
     df = data.copy()
     if type(columns) is str:
         columns = [columns]
 
+    def lemmatize_all(texts):
+        return lemmatize_strings(texts, n_jobs=n_jobs, chunksize=chunksize, executor=executor)
+
     for column in columns:
-        df[column] = df[column].apply(lambda x: lemmatize_string(x) if x is not np.nan else np.nan)
+        output_dtype = dtype
+        if output_dtype is None and is_pandas_string_dtype(df[column].dtype):
+            output_dtype = df[column].dtype
+        if cache is not None:
+            lemmatized = map_cached(df[column], lemmatize_all, cache, config_hash('lemmatize', nltk.__version__),
+                                    batch=True)
+        elif dedupe:
+            lemmatized = map_unique(df[column], lemmatize_all, batch=True)
+        else:
+            values = df[column].to_numpy(dtype=object, copy=True)
+            present = ~pd.isna(values)
+            values[present] = lemmatize_all(list(values[present]))
+            lemmatized = pd.Series(values, index=df.index).infer_objects()
+        if output_dtype is not None:
+            lemmatized = lemmatized.astype(output_dtype)
+        df[column] = lemmatized
     return df
 
 
-def remove_dont_knows(data, columns) -> pd.DataFrame:
+def is_pandas_string_dtype(dtype):
+    """
+    :param dtype: a pandas or NumPy dtype
+    :return: True for the pandas string dtypes, such as 'string' and 'string[pyarrow]', and False
+    for object columns (even if they hold strings)
+    """
+    return dtype != object and str(dtype).startswith('string')
+
+
+def map_unique(series, func, batch=False) -> pd.Series:
+    """
+    Apply a function to a Series by calling it once for each distinct value and mapping
+    the results back to every row. Survey responses repeat a lot, so this is usually
+    much quicker than applying the function row by row
+    :param series: the Series
+    :param func: a function taking a single value
+    :param batch: if True, func is instead called once with a list of all the distinct values
+    and returns a list of results
+    :return: a Series of results with the same index; missing values stay missing
+    """
+    codes, uniques = pd.factorize(series)
+    results = np.empty(len(uniques) + 1, dtype=object)
+    if batch:
+        results[:-1] = func(list(uniques))
+    else:
+        results[:-1] = [func(x) for x in uniques]
+    # missing values have a code of -1, which picks up the np.nan at the end
+    results[-1] = np.nan
+    return pd.Series(results[codes], index=series.index, name=series.name).infer_objects()
+
+
+def __stringify_missing__(series):
+    # cleaning row by row only passes np.nan itself through, and cleans other missing values such as
+    # None or float('nan') as strings; convert those to strings so factorize doesn't treat them as missing
+    missing = np.flatnonzero(series.isna().to_numpy())
+    values = series.to_numpy(dtype=object)
+    missing = [i for i in missing if values[i] is not np.nan]
+    if not missing:
+        return series
+    values = values.copy()
+    values[missing] = [str(values[i]) for i in missing]
+    return pd.Series(values, index=series.index, name=series.name)
+
+
+def remove_dont_knows(data, columns, classifier=None, dedupe=False, cache=None) -> pd.DataFrame:
     """
     Remove 'don't know' answers from a dataframe. This removes
     any rows that only contain 'don't know'. __Note__ that if multiple columns
     are supplied this will remove a row where any of the columns is 'dont know'
     :param data: the DataFrame
     :param columns: a single column name or list of column names
+    :param classifier: (optional) a DontKnowClassifier; defaults to one using DONT_KNOW_TERMS
+    :param dedupe: if True, test each distinct answer only once
+    :param cache: (optional) a TransformCache; only answers not already in the cache are tested
     :return: the modified DataFrame
     """
-    df = data.copy()
-    if type(columns) is str:
-        columns = [columns]
-    for column in columns:
-        df['dontknow'] = df[column].apply(lambda x: __replace_dont_knows__(x, '') if x is not np.nan else np.nan)
-        df['dontknow'].replace('', np.nan, inplace=True)
-        df.dropna(subset=['dontknow'], inplace=True)
-        df.drop(columns=['dontknow'], axis=1, inplace=True)
-    return df
+    if classifier is None:
+        classifier = __default_dont_know_classifier__()
+    mask = classifier.mask(data, columns, dedupe, cache)
+    return data[~mask].copy()
+
+
+class DontKnowClassifier:
+    """
+    Identifies answers that consist of nothing but 'don't know' or one of its synonyms.
+    Answers that exactly match a term are found with a set lookup; anything else is tested
+    against a single precompiled pattern matching any sequence of terms and whitespace
+    """
+
+    def __init__(self, terms=None):
+        """
+        :param terms: (optional) a list of terms; defaults to all the terms in DONT_KNOW_TERMS
+        """
+        if terms is None:
+            terms = [term for group in DONT_KNOW_TERMS for term in group]
+        self.terms = frozenset(term for term in terms if term)
+        self.pattern = re.compile(r'\s*(?:(?:' + __trie_pattern__(sorted(self.terms)) + r')\s*)*')
+
+    def is_dont_know(self, text):
+        """
+        :param text: the string to test
+        :return: True if the text only contains 'don't know' terms and whitespace
+        """
+        return text in self.terms or self.pattern.fullmatch(text) is not None
+
+    def mask(self, data, columns, dedupe=False, cache=None) -> pd.Series:
+        """
+        Flag the rows of a DataFrame where any of the columns is missing or a 'don't know'
+        :param data: the DataFrame
+        :param columns: a single column name or list of column names
+        :param dedupe: if True, test each distinct answer only once
+        :param cache: (optional) a TransformCache; only answers not already in the cache are tested
+        :return: a boolean Series aligned with the DataFrame
+        """
+        if type(columns) is str:
+            columns = [columns]
+        mask = np.zeros(len(data), dtype=bool)
+        for column in columns:
+            if cache is not None:
+                flags = map_cached(data[column], self.__flag_list__, cache, self.cache_config(), batch=True)
+                mask |= flags.fillna(True).to_numpy(dtype=bool)
+            elif dedupe:
+                codes, uniques = pd.factorize(data[column])
+                flags = np.append(self.__flag__(pd.Series(uniques, dtype=object)), True)
+                # missing values have a code of -1, which picks up the True at the end
+                mask |= flags[codes]
+            else:
+                missing = data[column].isna().to_numpy()
+                mask |= missing
+                mask[~missing] |= self.__flag__(data[column][~missing])
+        return pd.Series(mask, index=data.index)
+
+    def cache_config(self):
+        """
+        :return: a hash of the terms, identifying this classifier's results in a TransformCache
+        """
+        return config_hash('dont_know', sorted(self.terms))
+
+    def __flag_list__(self, values):
+        return [bool(flag) for flag in self.__flag__(pd.Series(values, dtype=object))]
+
+    def __flag__(self, text):
+        # test a Series of non-missing answers, using the set lookup first
+        dont_know = text.isin(self.terms).to_numpy()
+        if not dont_know.all():
+            unmatched = text[~dont_know]
+            if not is_pandas_string_dtype(unmatched.dtype):
+                unmatched = unmatched.astype(str)
+            dont_know[~dont_know] = unmatched.str.fullmatch(self.pattern.pattern).to_numpy(dtype=bool)
+        return dont_know
+
+
+@lru_cache(maxsize=None)
+def __default_dont_know_classifier__():
+    return DontKnowClassifier()
 
 
 def replace_dont_knows(data, columns, replacement='') -> pd.DataFrame:
@@ -102,29 +368,9 @@ def __replace_dont_knows__(text, replacement):
     :param replacement: the replacement string
     :return:
     """
-    terms = ['i honestly dont know', "im dont know", "i m dont know", "i really dont know", "i dont really know",
-             "i dont know really", "i dont know sorry", "sorry i dont know", "i dont know mate", "i dont know",
-             "i don t know", "i do not know", "dont really know", "dont know", "i dunno", "dunno", "don t know", "idk",
-             "do not know", 'i do nt know', 'do nt know', 'do nt know', 'i dont know to be honest', 'i do nt think there be anything',
-             'i do nt even know']
-    for word in terms:
-        text = text.replace(word, replacement)
-
-    terms = ['i am not really sure', 'im not too sure', 'im not really sure', 'not really sure', "i have no idea",
-             "i am not sure", "im not sure", "i m not sure", "im unsure", "unsure", "not sure", "not too sure",
-             "no idea", "not a clue", "no clue", 'do nt understand']
-    for word in terms:
-        text = text.replace(word, replacement)
-
-    terms = ["no comments", "no comment", "no opinion", "n a", "na", "none", "unknown", "no answer", 'not applicable',
-             'nil', 'no']
-    for word in terms:
-        text = text.replace(word, replacement)
-
-    terms = ['i cant think of anything', 'cant think of anything', 'i ca nt say', 'ca nt think of anything', 'i ca nt think of any',
-             'ca nt think of any']
-    for word in terms:
-        text = text.replace(word, replacement)
+    for terms in DONT_KNOW_TERMS:
+        for word in terms:
+            text = text.replace(word, replacement)
 
     return text.strip()
 
@@ -134,22 +380,15 @@ def replace_all_domain_terms(text, online_learning_platform_list=None, online_me
     :param text: the string to process
     :return: the processed string with domain terms normalised
     """
-    onetoone = ['1 2 1', '1 on 1', '1 to 1', '1-1', '1on1', '1:1', '1to1']
-
-    online = ['online learning', 'learning online',
-              'learn online', 'teaching online',
-              'online teaching', 'online courses', 'online course',
-              'online classes'
-              'online class', 'online lessons', 'online lesson',
-              'online lectures', 'online lecture'
-              ]
+    onetoone = ONETOONE
+    online = ONLINE
 
     if online_learning_platform_list is None:
-        online_learning_platform_list = ['blackboard', 'moodle', 'canvas']
+        online_learning_platform_list = ONLINE_LEARNING_PLATFORM
     online_learning_platform = online_learning_platform_list
 
     if online_meeting_tool_list is None:
-        online_meeting_tool_list = ['zoom', 'blackboard collaborate', 'microsoft teams', 'ms teams', 'microsoft team', 'ms team', 'big blue button']
+        online_meeting_tool_list = ONLINE_MEETING_TOOL
     online_meeting_tool = online_meeting_tool_list
 
     # checks both lists are same length
@@ -175,135 +414,429 @@ def replace_all_domain_terms(text, online_learning_platform_list=None, online_me
     return text
 
 
-def replace_domain_terms(text, domain_terms, replacement):
+def replace_domain_terms(text, domain_terms, replacement, whole_words=False, leftmost_longest=False):
     """
     Replace domain terms within text
     :param text: the text to process
     :param domain_terms: the list of domain terms
     :param replacement: the replacement for the domain terms
+    :param whole_words: if True, only replace terms that are not part of a longer word
+    :param leftmost_longest: if True, replace every term in a single pass, preferring the leftmost and then
+    longest match where terms overlap; by default each term is replaced in turn, in list order
     :return: the processed string
     """
-    for word in domain_terms:
-        text = text.replace(word, replacement)
-    return text
-
+    return compile_terms(tuple(domain_terms), whole_words, leftmost_longest).replace(text, replacement)
 
-def __clean__(df, column, inplace, online_learning_platform_list=None, online_meeting_tool_list=None, domain_term=None, domain_string=None):
-
-    df = df.copy()
-
-    if not inplace:
-
-        cleaned = 'cleaned'
-        if cleaned in df.columns:
-            cleaned = cleaned + "_" + column
-
-        df[cleaned] = df[column]
-        column = cleaned
 
-    # remove apostrophes
-    df[column] = df[column].apply(
-        lambda x: str(x).replace("'", '').replace("`", '').replace("’", '').replace("’", '')
-        if x is not np.nan else np.nan)
-
-    # Put Teams with a capital as an onlinelearningplatform string as it can be a term for team working etc
-    # Before the lowercase amendment
-
-    df[column] = df[column].apply(
-        lambda x: str(x).replace('Teams', 'onlinelearningplatform')
-        if x is not np.nan else np.nan)
+class TermMatcher:
+    """
+    Matches any of a list of terms in a single scan of the text. The terms are compiled
+    into a trie-shaped regular expression, so the cost of finding them depends on the length
+    of the text rather than the number of terms.
+
+    By default replace() gives the same result as replacing each term in turn, in list order,
+    so an earlier term wins and a replacement can itself be matched by a later term; the single
+    scan is used to return text that contains none of the terms unchanged. With leftmost_longest,
+    every term is instead replaced in the single scan, and where terms overlap the leftmost and
+    then longest match wins
+    """
 
+    def __init__(self, terms, whole_words=False, leftmost_longest=False):
+        """
+        :param terms: the terms to match; empty terms are ignored
+        :param whole_words: if True, only match terms that are not part of a longer word
+        :param leftmost_longest: if True, replace all the terms in a single pass (see above)
+        """
+        terms = [term for term in terms if term]
+        self.terms = list(dict.fromkeys(terms))
+        self.whole_words = whole_words
+        self.leftmost_longest = leftmost_longest
+        self.pattern = None
+        self.__sequence = []
+        if self.terms:
+            pattern = __trie_pattern__(self.terms)
+            if whole_words:
+                pattern = r'(?<!\w)' + pattern + r'(?!\w)'
+            self.pattern = re.compile(pattern)
+        for term in terms:
+            # replacing in list order applies every term, including any repeats
+            if whole_words:
+                self.__sequence.append((term, re.compile(r'(?<!\w)' + re.escape(term) + r'(?!\w)')))
+            else:
+                self.__sequence.append((term, None))
+
+    def replace(self, text, replacement):
+        """
+        Replace every match in the text
+        :param text: the text to process
+        :param replacement: the literal replacement string
+        :return: the processed string
+        """
+        if self.pattern is None:
+            return text
+        escaped = replacement.replace('\\', r'\\')
+        if self.leftmost_longest:
+            return self.pattern.sub(escaped, text)
+        # nothing is replaced unless one of the terms is in the original text
+        if self.pattern.search(text) is None:
+            return text
+        for term, pattern in self.__sequence:
+            text = text.replace(term, replacement) if pattern is None else pattern.sub(escaped, text)
+        return text
+
+    def replace_series(self, series, replacement) -> pd.Series:
+        """
+        Replace every match in a Series of strings with vectorised string operations, giving the
+        same results as replace(). Whole-word matching needs lookarounds, which the Arrow regex
+        engine doesn't have, so whole-word matchers replace each value in turn instead
+        :param series: the Series, which should have a pandas string dtype
+        :param replacement: the literal replacement string
+        :return: the processed Series
+        """
+        if self.pattern is None:
+            return series
+        if self.whole_words:
+            return series.map(lambda text: self.replace(text, replacement), na_action='ignore').astype(series.dtype)
+        escaped = replacement.replace('\\', r'\\')
+        if self.leftmost_longest:
+            return series.str.replace(self.pattern.pattern, escaped, regex=True)
+        for term, pattern in self.__sequence:
+            if pattern is None:
+                series = series.str.replace(term, replacement, regex=False)
+            else:
+                series = series.str.replace(pattern.pattern, escaped, regex=True)
+        return series
+
+    def search(self, text):
+        """
+        :param text: the text to search
+        :return: True if any of the terms occur in the text
+        """
+        return self.pattern is not None and self.pattern.search(text) is not None
+
+    def findall(self, text):
+        """
+        :param text: the text to search
+        :return: a list of the terms found in the text, in order of appearance; where terms overlap,
+        the leftmost and then longest is found
+        """
+        if self.pattern is None:
+            return []
+        return self.pattern.findall(text)
+
+
+@lru_cache(maxsize=256)
+def compile_terms(terms, whole_words=False, leftmost_longest=False):
+    """
+    Get a TermMatcher for a tuple of terms, reusing a previously compiled matcher if there is one
+    :param terms: a tuple of terms
+    :param whole_words: if True, only match terms that are not part of a longer word
+    :param leftmost_longest: if True, replace all the terms in a single pass (see TermMatcher)
+    :return: a TermMatcher
+    """
+    return TermMatcher(terms, whole_words, leftmost_longest)
 
-    # lowercase
-    df[column] = df[column].apply(
-        lambda x: x.lower()
-        if x is not np.nan else np.nan)
 
-    # Domain terms
-    df[column] = df[column].apply(
-        lambda x: replace_all_domain_terms(x, online_learning_platform_list, online_meeting_tool_list, domain_term, domain_string)
-        if x is not np.nan else np.nan)
+def __trie_pattern__(terms):
+    """
+    Build a regular expression from a trie of the terms, e.g. ['ms team', 'ms teams', 'moodle']
+    becomes 'm(?:oodle|s team(?:s)?)'
+    """
+    trie = {}
+    for term in terms:
+        node = trie
+        for char in term:
+            node = node.setdefault(char, {})
+        node[''] = {}
+    return __node_pattern__(trie)
+
+
+def __node_pattern__(node):
+    branches = [re.escape(char) + __node_pattern__(child) for char, child in sorted(node.items()) if char]
+    if not branches:
+        return ''
+    if len(branches) == 1 and '' not in node:
+        return branches[0]
+    pattern = '(?:' + '|'.join(branches) + ')'
+    if '' in node:
+        # the term may end here, but prefer the longer match if there is one
+        pattern += '?'
+    return pattern
+
+
+class Cleaner:
+    """
+    A compiled cleaning configuration. The domain term lists are resolved once when the
+    Cleaner is created and each column is then cleaned in a single pass, applying every
+    cleaning step to a string before moving on to the next one
+    """
 
-    # remove punctuation, remove extra whitespace in string and on both sides of string
-    df[column] = df[column].apply(
-        lambda x: re.sub(r'[^a-z]', ' ', x).replace(' +', ' ').strip()
-        if x is not np.nan else np.nan)
+    def __init__(self, domains=True, online_learning_platform_list=None, online_meeting_tool_list=None,
+                 domain_term=None, domain_string=None, leftmost_longest=False):
+        """
+        :param domains: if False, domain terms are left untouched (as in clean_without_domain)
+        :param online_learning_platform_list: (optional) terms to replace with 'onlinelearningplatform'
+        :param online_meeting_tool_list: (optional) terms to replace with 'onlinemeetingtool'
+        :param domain_term: (optional) a list of user-defined lists of terms
+        :param domain_string: (optional) the replacement for each list in domain_term
+        :param leftmost_longest: if True, replace each list's terms in a single pass, preferring the leftmost
+        and then longest match (see TermMatcher); by default the terms are replaced in list order, as
+        replace_domain_terms does
+        """
+        self.domains = domains
+        self.leftmost_longest = leftmost_longest
+        self.replacements = []
+        if not domains:
+            return
+
+        if online_learning_platform_list is None:
+            online_learning_platform_list = ONLINE_LEARNING_PLATFORM
+        if online_meeting_tool_list is None:
+            online_meeting_tool_list = ONLINE_MEETING_TOOL
+
+        # checks both lists are same length
+        if domain_term is not None and domain_string is not None:
+            if len(domain_term) != len(domain_string):
+                raise ValueError("Domain terms and domain words must be the same length")
+            print(len(domain_term), ':user specified lists were added to the replace_all_domain_terms function')
+            for term_list, replacement in zip(domain_term, domain_string):
+                self.replacements.append((TermMatcher(term_list, leftmost_longest=leftmost_longest), replacement))
+
+        self.replacements.append((compile_terms(tuple(ONETOONE), False, leftmost_longest), 'onetoone'))
+        self.replacements.append((TermMatcher(online_learning_platform_list, leftmost_longest=leftmost_longest),
+                                  'onlinelearningplatform'))
+        self.replacements.append((compile_terms(tuple(ONLINE), False, leftmost_longest), 'online learning'))
+        self.replacements.append((TermMatcher(online_meeting_tool_list, leftmost_longest=leftmost_longest),
+                                  'onlinemeetingtool'))
+
+    def clean_string(self, text):
+        """
+        Clean a single value
+        :param text: the value to clean; non-string values are converted to strings first
+        :return: the cleaned string, which may be empty
+        """
+        # remove apostrophes
+        text = str(text).replace("'", '').replace("`", '').replace("\u2019", '')
+
+        if self.domains:
+            # Put Teams with a capital as an onlinelearningplatform string as it can be a term for team working etc
+            # Before the lowercase amendment
+            text = text.replace('Teams', 'onlinelearningplatform')
+
+        # lowercase
+        text = text.lower()
+
+        # Domain terms
+        for matcher, replacement in self.replacements:
+            text = matcher.replace(text, replacement)
+
+        # remove punctuation and whitespace on both sides of string
+        return __remove_non_alpha__(text).strip()
+
+    def clean_series(self, series, dedupe=False, cache=None) -> pd.Series:
+        """
+        Clean every value in a Series; missing values are passed through and empty results
+        are replaced with np.nan. A Series with a pandas string dtype such as 'string[pyarrow]'
+        is cleaned with vectorised string operations (Arrow compute kernels for 'string[pyarrow]')
+        and keeps its dtype
+        :param series: the Series to clean
+        :param dedupe: if True, clean each distinct value only once
+        :param cache: (optional) a TransformCache; only values not already in the cache are cleaned
+        :return: the cleaned Series
+        """
+        if not is_pandas_string_dtype(series.dtype) and (dedupe or cache is not None):
+            series = __stringify_missing__(series)
+
+        if cache is not None:
+            cleaned = map_cached(series, self.clean_string, cache, self.cache_config()).replace('', np.nan)
+            if is_pandas_string_dtype(series.dtype):
+                cleaned = cleaned.astype(series.dtype)
+            return cleaned
+
+        if is_pandas_string_dtype(series.dtype):
+            if dedupe:
+                codes, uniques = pd.factorize(series)
+                cleaned = self.__clean_strings__(pd.Series(uniques, dtype=series.dtype))
+                return pd.Series(cleaned.array.take(codes, allow_fill=True), index=series.index, name=series.name)
+            return self.__clean_strings__(series)
+
+        if dedupe:
+            cleaned = map_unique(series, self.clean_string)
+        else:
+            cleaned = pd.Series(
+                [self.clean_string(x) if x is not np.nan else np.nan for x in series],
+                index=series.index,
+                name=series.name
+            )
+        return cleaned.replace('', np.nan)
+
+    def cache_config(self):
+        """
+        :return: a hash of the cleaning configuration, identifying this Cleaner's results in a TransformCache
+        """
+        terms = [(matcher.terms, replacement) for matcher, replacement in self.replacements]
+        return config_hash('clean', self.domains, self.leftmost_longest, terms)
+
+    def __clean_strings__(self, text):
+        # the same steps as clean_string, applied to a whole Series at once
+        for apostrophe in ("'", "`", "\u2019"):
+            text = text.str.replace(apostrophe, '', regex=False)
+        if self.domains:
+            text = text.str.replace('Teams', 'onlinelearningplatform', regex=False)
+        text = text.str.lower()
+        for matcher, replacement in self.replacements:
+            text = matcher.replace_series(text, replacement)
+        text = text.str.replace(__NON_ALPHA__.pattern, ' ', regex=True).str.strip()
+        return text.replace('', np.nan)
+
+    def clean(self, data, columns, inplace=False, dedupe=False, dtype=None, cache=None) -> pd.DataFrame:
+        """
+        Cleans a dataframe
+        :param data: the dataframe to clean
+        :param columns: a single column name or list of column names to clean
+        :param inplace: if True, changes are made to the specified column; otherwise, a 'cleaned'
+        column is appended to the dataframe
+        :param dedupe: if True, clean each distinct value only once
+        :param dtype: (optional) convert the columns to this dtype before cleaning, e.g. 'string[pyarrow]';
+        by default the cleaned columns have the same dtype as the original ones
+        :param cache: (optional) a TransformCache; only values not already in the cache are cleaned
+        :return: the cleaned dataframe
+        """
+        df = data.copy()
+
+        if type(columns) is str:
+            columns = [columns]
+
+        for column, output in zip(columns, self.output_columns(df, columns, inplace)):
+            series = df[column] if dtype is None else df[column].astype(dtype)
+            df[output] = self.clean_series(series, dedupe, cache)
+        return df
+
+    @staticmethod
+    def output_columns(data, columns, inplace=False):
+        """
+        Get the names of the columns that clean() writes its results to
+        :param data: the dataframe to clean
+        :param columns: a single column name or list of column names to clean
+        :param inplace: as for clean()
+        :return: a list of column names, one for each column to clean
+        """
+        if type(columns) is str:
+            columns = [columns]
+        existing = set(data.columns)
+        outputs = []
+        for column in columns:
+            output = column
+            if not inplace:
+                output = 'cleaned'
+                if output in existing:
+                    output = output + "_" + column
+            existing.add(output)
+            outputs.append(output)
+        return outputs
+
+
+def __remove_non_alpha__(text):
+    # a byte translation table is much quicker than a regex for the common all-ASCII case
+    if text.isascii():
+        return text.encode('ascii').translate(__NON_ALPHA_ASCII__).decode('ascii')
+    return __NON_ALPHA__.sub(' ', text)
 
-    df[column].replace('', np.nan, inplace=True)
 
-    return df
+def __clean__(df, column, inplace, online_learning_platform_list=None, online_meeting_tool_list=None, domain_term=None, domain_string=None):
+    cleaner = Cleaner(True, online_learning_platform_list, online_meeting_tool_list, domain_term, domain_string)
+    return cleaner.clean(df, column, inplace)
 
 
-def clean(data, columns, inplace=False, online_learning_platform_list=None, online_meeting_tool_list=None, domain_term=None, domain_string=None) -> pd.DataFrame:
+def clean(data, columns, inplace=False, online_learning_platform_list=None, online_meeting_tool_list=None, domain_term=None, domain_string=None, dedupe=False, dtype=None, cache=None) -> pd.DataFrame:
     """
     Cleans a dataframe
     :param data: the dataframe to clean
     :param columns: a single column name or list of column names to clean
     :param inplace: if True, changes are made to the specified column; otherwise, a 'cleaned'
     column is appended to the dataframe
+    :param dedupe: if True, clean each distinct value only once
+    :param dtype: (optional) convert the columns to this dtype before cleaning, e.g. 'string[pyarrow]'
+    :param cache: (optional) a TransformCache; only values not already in the cache are cleaned
     :return: the cleaned dataframe
     """
-    df = data.copy()
-
-    if type(columns) is str:
-        columns = [columns]
-
-    for column in columns:
-        df = __clean__(df, column, inplace, online_learning_platform_list, online_meeting_tool_list, domain_term, domain_string)
-    return df
+    cleaner = Cleaner(True, online_learning_platform_list, online_meeting_tool_list, domain_term, domain_string)
+    return cleaner.clean(data, columns, inplace, dedupe, dtype, cache)
 
     # Clean without domain for summarising apps
 
 def __clean_without_domains__(df, column, inplace):
+    return Cleaner(domains=False).clean(df, column, inplace)
 
-    df = df.copy()
-
-    if not inplace:
-
-        cleaned = 'cleaned'
-        if cleaned in df.columns:
-            cleaned = cleaned + "_" + column
-
-        df[cleaned] = df[column]
-        column = cleaned
-
-    # remove apostrophes
-    df[column] = df[column].apply(
-        lambda x: str(x).replace("'", '').replace("`", '').replace("’", '').replace("’", '')
-        if x is not np.nan else np.nan)
-
-    # lowercase
-    df[column] = df[column].apply(
-        lambda x: x.lower()
-        if x is not np.nan else np.nan)
-
-       # remove punctuation, remove extra whitespace in string and on both sides of string
-    df[column] = df[column].apply(
-        lambda x: re.sub(r'[^a-z]', ' ', x).replace(' +', ' ').strip()
-        if x is not np.nan else np.nan)
-
-    df[column].replace('', np.nan, inplace=True)
 
-    return df
-
-
-def clean_without_domain(data, columns, inplace=False) -> pd.DataFrame:
+def clean_without_domain(data, columns, inplace=False, dedupe=False, dtype=None, cache=None) -> pd.DataFrame:
     """
     Cleans a dataframe
     :param data: the dataframe to clean
     :param columns: a single column name or list of column names to clean
     :param inplace: if True, changes are made to the specified column; otherwise, a 'cleaned'
     column is appended to the dataframe
+    :param dedupe: if True, clean each distinct value only once
+    :param dtype: (optional) convert the columns to this dtype before cleaning, e.g. 'string[pyarrow]'
+    :param cache: (optional) a TransformCache; only values not already in the cache are cleaned
     :return: the cleaned dataframe
     """
-    df = data.copy()
+    return Cleaner(domains=False).clean(data, columns, inplace, dedupe, dtype, cache)
 
-    if type(columns) is str:
-        columns = [columns]
+def clean_chunks(chunks, columns, inplace=False, drop_dont_knows=True, lemmatize_text=True, cleaner=None,
+                 dedupe=False, n_jobs=1, cache=None):
+    """
+    Clean a sequence of DataFrames one at a time, for data too large to hold in memory. Each
+    chunk is cleaned and then (optionally) has its 'don't know' answers removed and is lemmatized
+    :param chunks: an iterable of DataFrames, e.g. pd.read_csv(..., chunksize=...)
+    :param columns: a single column name or list of column names to clean
+    :param inplace: as for clean(); if False, the later steps are applied to the 'cleaned' columns
+    :param drop_dont_knows: if True, remove rows where a cleaned column is a 'don't know'
+    :param lemmatize_text: if True, lemmatize the cleaned columns
+    :param cleaner: (optional) the Cleaner to use; defaults to the same cleaning as clean()
+    :param dedupe: passed to each step; if True, each distinct value is processed only once per chunk
+    :param n_jobs: the number of worker processes used for lemmatizing; the same workers are used for every chunk
+    :param cache: (optional) a TransformCache shared by every step, so values seen in earlier runs are not reprocessed
+    :return: a generator of processed DataFrames
+    """
+    if cleaner is None:
+        cleaner = Cleaner()
+    # start the lemmatizing workers once for all the chunks, rather than once per chunk and column
+    with lemmatize_pool(n_jobs if lemmatize_text else 1) as executor:
+        for chunk in chunks:
+            outputs = cleaner.output_columns(chunk, columns, inplace)
+            df = cleaner.clean(chunk, columns, inplace, dedupe, cache=cache)
+            if drop_dont_knows:
+                df = remove_dont_knows(df, outputs, dedupe=dedupe, cache=cache)
+            if lemmatize_text:
+                df = lemmatize(df, outputs, dedupe=dedupe, n_jobs=n_jobs, cache=cache, executor=executor)
+            yield df
+
+
+def clean_csv(src, dst, columns, chunksize=100000, inplace=False, drop_dont_knows=True, lemmatize_text=True,
+              cleaner=None, dedupe=False, n_jobs=1, index=False, cache=None, **read_csv_args):
+    """
+    Clean a CSV file chunk by chunk, writing each processed chunk to the output file as soon
+    as it is ready, so memory use depends on the chunk size rather than the size of the file
+    :param src: the path of the CSV file to read
+    :param dst: the path of the CSV file to write
+    :param columns: a single column name or list of column names to clean
+    :param chunksize: the number of rows to read at a time
+    :param index: if True, write the row numbers of the input file as the first column
+    :param read_csv_args: any further arguments for pd.read_csv
+    :return: the number of rows written
+
+    See clean_chunks for the remaining parameters.
+    """
+    reader = pd.read_csv(src, chunksize=chunksize, **read_csv_args)
+    rows = 0
+    first = True
+    for df in clean_chunks(reader, columns, inplace, drop_dont_knows, lemmatize_text, cleaner, dedupe, n_jobs, cache):
+        df.to_csv(dst, mode='w' if first else 'a', header=first, index=index)
+        first = False
+        rows += len(df)
+    return rows
 
-    for column in columns:
-        df = __clean_without_domains__(df, column, inplace)
-    return df
 
     # Functions below included for future automation of terms/lists of terms
     # For user defined list, have a folder in the directory named user-defined_corpus
@@ -327,10 +860,113 @@ def load_list(filename):
     :param filename: the name of the file to load
     :return: a list
     """
-    path = resource_path(filename)
+    return __read_list__(resource_path(filename))
+
+
+def __read_list__(path):
     list = []
     with open(path) as f:
         for line in f:
             if not line.strip().startswith("#") and len(line.strip()) > 0:
                 list.append(line.strip())
-    return list
\ No newline at end of file
+    return list
+
+
+class TermList:
+    """
+    A list of terms compiled for fast matching: single-word terms are kept in a set for
+    looking up tokens, and the whole list is compiled into a TermMatcher for finding
+    and replacing terms (including multi-word phrases) within text
+    """
+
+    def __init__(self, terms):
+        """
+        :param terms: a list of terms
+        """
+        self.terms = list(terms)
+        self.tokens = frozenset(term for term in self.terms if ' ' not in term)
+        self.phrases = TermMatcher([term for term in self.terms if ' ' in term])
+        self.matcher = TermMatcher(self.terms)
+        self.__terms = frozenset(self.terms)
+
+    def __contains__(self, term):
+        return term in self.__terms
+
+    def __iter__(self):
+        return iter(self.terms)
+
+    def __len__(self):
+        return len(self.terms)
+
+    def replace(self, text, replacement):
+        """
+        Replace every occurrence of the terms in the text
+        :param text: the text to process
+        :param replacement: the replacement string
+        :return: the processed string
+        """
+        return self.matcher.replace(text, replacement)
+
+
+class TermListRegistry:
+    """
+    Loads named term lists once and keeps them compiled. Each time a list is requested
+    the modification time of its file is checked, and the list is reloaded only if the
+    file has changed, so long-running processes pick up edited lists without re-reading
+    them on every request
+    """
+
+    def __init__(self, directory=None):
+        """
+        :param directory: (optional) the directory containing the lists; defaults to the
+        user_defined_corpus folder used by load_list
+        """
+        self.directory = directory
+        self.__entries = {}
+        self.__lock = threading.Lock()
+
+    def path(self, filename):
+        """
+        :param filename: the name of a list
+        :return: the path of the file the list is loaded from
+        """
+        if self.directory is None:
+            return resource_path(filename)
+        return os.path.join(self.directory, filename)
+
+    def get(self, filename) -> TermList:
+        """
+        Get a compiled term list, loading it if it hasn't been loaded yet or its file has changed
+        :param filename: the name of the file containing the list
+        :return: a TermList
+        """
+        path = self.path(filename)
+        stat = os.stat(path)
+        modified = (stat.st_mtime_ns, stat.st_size)
+        with self.__lock:
+            entry = self.__entries.get(path)
+            if entry is None or entry[0] != modified:
+                entry = (modified, TermList(__read_list__(path)))
+                self.__entries[path] = entry
+            return entry[1]
+
+    def clear(self):
+        """
+        Forget all the loaded lists
+        """
+        with self.__lock:
+            self.__entries.clear()
+
+
+# The registry used by get_term_list
+term_lists = TermListRegistry()
+
+
+def get_term_list(filename) -> TermList:
+    """
+    Get a compiled term list from the user_defined_corpus folder, loading it only when
+    it is first used or its file has changed
+    :param filename: the name of the file to load
+    :return: a TermList
+    """
+    return term_lists.get(filename)
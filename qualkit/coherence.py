@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+
+def topic_coherence(matrix, top_terms, overall=False):
+    """
+    Measures how coherent each topic is from how often its top terms appear in the same
+    documents. The document co-occurrence counts of every top term of every topic are found
+    with a single sparse matrix product, so this is quick even for large corpora.
+
+    Two measures are returned for each topic, both averaged over every pair of its top terms:
+
+    * NPMI, the normalised pointwise mutual information, from -1 (the terms never appear
+      together) to 1 (they always appear together)
+    * UMass, the log of the number of documents containing both terms (plus one) over the number
+      containing the higher-ranked term; higher is better. It is usually negative, but because of
+      the plus one it can be slightly above zero when the terms nearly always appear together
+
+    :param matrix: a document-term matrix with one row per document, e.g. the output of a
+    CountVectorizer; any non-zero value counts as the term being present
+    :param top_terms: for each topic, the column indices of its top terms, best first, e.g. from
+    qualkit.topk.top_indices; topics may have different numbers of terms
+    :param overall: if True, also return the coherence of the whole model
+    :return: a DataFrame with 'topic' (counting from 1), 'npmi' and 'umass' columns; if overall is
+    True, a tuple of that DataFrame and a dict with the model's 'npmi' and 'umass', the mean over
+    its topics (topics with a single term, which have no coherence, are left out)
+    """
+    top_terms = [np.asarray(terms, dtype=np.int64) for terms in top_terms]
+    columns = np.unique(np.concatenate(top_terms)) if top_terms else np.empty(0, dtype=np.int64)
+
+    # documents x top terms, as 0/1, and from it the co-occurrence counts of every pair of top terms
+    present = (sparse.csr_matrix(matrix)[:, columns] != 0).astype(np.int64)
+    co_occurrence = (present.T @ present).toarray()
+    n_documents = matrix.shape[0]
+
+    npmi = []
+    umass = []
+    for terms in top_terms:
+        positions = np.searchsorted(columns, terms)
+        counts = co_occurrence[np.ix_(positions, positions)]
+        documents = np.diag(counts).astype(np.float64)
+        # every pair of terms, with the higher-ranked term first
+        first, second = np.triu_indices(len(terms), 1)
+        if len(first) == 0:
+            npmi.append(np.nan)
+            umass.append(np.nan)
+            continue
+        joint = counts[first, second].astype(np.float64)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            umass.append(np.nanmean(np.where(documents[first] > 0,
+                                             np.log((joint + 1) / documents[first]), np.nan)))
+
+            p_joint = joint / n_documents
+            pmi = np.log(p_joint / (documents[first] / n_documents * documents[second] / n_documents))
+            pair_npmi = np.where(joint == 0, -1.0, np.where(joint == n_documents, 1.0, pmi / -np.log(p_joint)))
+            npmi.append(np.mean(pair_npmi))
+
+    per_topic = pd.DataFrame({'topic': np.arange(1, len(top_terms) + 1), 'npmi': npmi, 'umass': umass})
+    if overall:
+        return per_topic, {'npmi': per_topic['npmi'].mean(), 'umass': per_topic['umass'].mean()}
+    return per_topic
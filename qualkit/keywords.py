@@ -1,15 +1,25 @@
+from functools import lru_cache
+
 from rake_nltk import Rake
-import nltk
 from nltk.stem import WordNetLemmatizer
 
-from qualkit.stopwords import stopwords
-
-nltk.download('wordnet')
+from qualkit.resources import require
+from qualkit.stopwords import get_stopwords
 
 # initiate nltk lemmatiser
 lemma = WordNetLemmatizer()
 
-r = Rake(stopwords=stopwords, min_length=1, max_length=4)
+
+@lru_cache(maxsize=None)
+def __rake__():
+    # created on first use, as it needs the stopwords corpus
+    return Rake(stopwords=get_stopwords(), min_length=1, max_length=4)
+
+
+def __getattr__(name):
+    if name == 'r':
+        return __rake__()
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
 
 
 def rake_implement(x, r):
@@ -18,6 +28,9 @@ def rake_implement(x, r):
 
 
 def add_keywords(df, column):
+    for name in ('punkt', 'wordnet', 'omw-1.4'):
+        require(name)
+    r = __rake__()
     df = df.copy()
     df['keywords'] = df[column].apply(lambda x: rake_implement(x, r))
     df['keywords'] = df['keywords'].apply(lambda x: [lemma.lemmatize(y) for y in x])
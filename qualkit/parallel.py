@@ -0,0 +1,174 @@
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import contextmanager
+
+import numpy as np
+
+
+def effective_n_jobs(n_jobs):
+    """
+    Work out how many worker processes to use. As with scikit-learn, -1 means one per CPU,
+    -2 one fewer than that, and so on
+    :param n_jobs: the requested number of jobs; None is treated as 1
+    :return: the number of processes, at least 1
+    """
+    if n_jobs is None:
+        return 1
+    if n_jobs < 0:
+        n_jobs = (os.cpu_count() or 1) + 1 + n_jobs
+    return max(1, n_jobs)
+
+
+def split(items, chunksize):
+    """
+    Split a list into consecutive chunks
+    :param items: the list to split
+    :param chunksize: the maximum length of each chunk
+    :return: a list of lists
+    """
+    return [items[start:start + chunksize] for start in range(0, len(items), chunksize)]
+
+
+def default_chunksize(length, n_jobs, maximum=None):
+    """
+    Pick a chunk size that gives every worker at least one chunk
+    :param length: the number of items to process
+    :param n_jobs: the number of worker processes
+    :param maximum: (optional) the largest chunk size to use
+    :return: the chunk size
+    """
+    chunksize = max(1, math.ceil(length / n_jobs))
+    if maximum is not None:
+        chunksize = min(chunksize, maximum)
+    return chunksize
+
+
+@contextmanager
+def pool(n_jobs, initializer=None):
+    """
+    Start a pool of worker processes that can be passed to several calls of map_chunks, so
+    the cost of starting the workers (and of any initializer) is only paid once
+    :param n_jobs: the number of worker processes; -1 uses one per CPU
+    :param initializer: (optional) a module-level function run once in each worker when it starts
+    :return: a context manager giving the pool, or None if n_jobs is 1 and the work should be done in
+    this process; the workers are shut down when the context exits
+    """
+    n_jobs = effective_n_jobs(n_jobs)
+    if n_jobs <= 1:
+        yield None
+        return
+    with ProcessPoolExecutor(max_workers=n_jobs, initializer=initializer) as executor:
+        yield executor
+
+
+def map_chunks(func, chunks, n_jobs, initializer=None, executor=None):
+    """
+    Apply a function to each chunk in a pool of worker processes, returning
+    the results in the same order as the chunks
+    :param func: a module-level function taking a single chunk
+    :param chunks: a list of chunks
+    :param n_jobs: the number of worker processes
+    :param initializer: (optional) a module-level function run once in each worker when it starts
+    :param executor: (optional) a pool from pool() to use instead of starting new workers; its
+    initializer is used rather than this one
+    :return: a list of results, one per chunk
+    """
+    if executor is not None:
+        return list(executor.map(func, chunks))
+    n_jobs = min(effective_n_jobs(n_jobs), len(chunks))
+    if n_jobs <= 1:
+        if initializer is not None:
+            initializer()
+        return [func(chunk) for chunk in chunks]
+    with ProcessPoolExecutor(max_workers=n_jobs, initializer=initializer) as executor:
+        return list(executor.map(func, chunks))
+
+
+def imap(func, items, n_jobs, initializer=None):
+    """
+    Apply a function to each item in a pool of worker processes, yielding the results
+    in the same order as the items as soon as they are ready. If the caller stops early
+    (for example by breaking out of a loop over the results), items that haven't been
+    started yet are cancelled
+    :param func: a module-level function taking a single item
+    :param items: a list of items
+    :param n_jobs: the number of worker processes
+    :param initializer: (optional) a module-level function run once in each worker when it starts
+    :return: a generator of results, one per item
+    """
+    n_jobs = min(effective_n_jobs(n_jobs), len(items))
+    if n_jobs <= 1:
+        if initializer is not None:
+            initializer()
+        for item in items:
+            yield func(item)
+        return
+    with ProcessPoolExecutor(max_workers=n_jobs, initializer=initializer) as executor:
+        futures = [executor.submit(func, item) for item in items]
+        try:
+            for future in futures:
+                yield future.result()
+        finally:
+            for future in futures:
+                future.cancel()
+
+
+def imap_unordered(func, items, n_jobs, initializer=None):
+    """
+    Apply a function to each item in a pool of worker processes, yielding each result
+    as soon as it is ready, whatever its position. As with imap, items that haven't been
+    started are cancelled if the caller stops early
+    :param func: a module-level function taking a single item
+    :param items: a list of items
+    :param n_jobs: the number of worker processes
+    :param initializer: (optional) a module-level function run once in each worker when it starts
+    :return: a generator of (position of the item, result) tuples
+    """
+    n_jobs = min(effective_n_jobs(n_jobs), len(items))
+    if n_jobs <= 1:
+        if initializer is not None:
+            initializer()
+        for position, item in enumerate(items):
+            yield position, func(item)
+        return
+    with ProcessPoolExecutor(max_workers=n_jobs, initializer=initializer) as executor:
+        futures = {executor.submit(func, item): position for position, item in enumerate(items)}
+        try:
+            for future in as_completed(futures):
+                yield futures[future], future.result()
+        finally:
+            for future in futures:
+                future.cancel()
+
+
+def share_csr(matrix, directory):
+    """
+    Write the arrays of a sparse CSR matrix to .npy files, so that worker processes can
+    memory-map the matrix rather than each receiving a copy of it
+    :param matrix: a scipy.sparse CSR matrix
+    :param directory: an existing directory to write the files to, e.g. a tempfile.TemporaryDirectory
+    :return: a small handle to pass to the workers, which open the matrix with load_csr
+    """
+    # read-only arrays can't be put into canonical form by the workers, so do it here
+    if not matrix.has_canonical_format:
+        matrix = matrix.copy()
+        matrix.sum_duplicates()
+    for name in ('data', 'indices', 'indptr'):
+        np.save(os.path.join(directory, name + '.npy'), getattr(matrix, name))
+    return directory, matrix.shape
+
+
+def load_csr(handle, mmap_mode='r'):
+    """
+    Open a matrix written by share_csr
+    :param handle: the handle returned by share_csr
+    :param mmap_mode: how to memory-map the arrays (see numpy.load)
+    :return: a scipy.sparse CSR matrix backed by the files
+    """
+    from scipy.sparse import csr_matrix
+
+    directory, shape = handle
+    arrays = [np.load(os.path.join(directory, name + '.npy'), mmap_mode=mmap_mode)
+              for name in ('data', 'indices', 'indptr')]
+    return csr_matrix(tuple(arrays), shape=shape, copy=False)
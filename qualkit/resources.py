@@ -0,0 +1,30 @@
+from functools import lru_cache
+
+import nltk
+
+# Where each of the NLTK resources used by qualkit is found within nltk_data
+NLTK_RESOURCES = {
+    'wordnet': 'corpora/wordnet',
+    'omw-1.4': 'corpora/omw-1.4',
+    'punkt': 'tokenizers/punkt',
+    'averaged_perceptron_tagger': 'taggers/averaged_perceptron_tagger',
+    'stopwords': 'corpora/stopwords',
+    'vader_lexicon': 'sentiment/vader_lexicon.zip',
+}
+
+
+@lru_cache(maxsize=None)
+def require(name):
+    """
+    Make sure an NLTK resource is available, downloading it only if it can't be found
+    locally. The check is made once per process, so this is cheap to call before every
+    use of the resource. On machines without network access, install the resources into
+    one of the nltk_data directories beforehand
+    :param name: the name of the resource, as passed to nltk.download
+    :return: True if the resource is available
+    """
+    try:
+        nltk.data.find(NLTK_RESOURCES.get(name, name))
+        return True
+    except LookupError:
+        return nltk.download(name, quiet=True)
@@ -1,13 +1,22 @@
 import nltk
 from nltk.sentiment import SentimentIntensityAnalyzer
 
-nltk.download('vader_lexicon')
+from qualkit.cache import config_hash, map_cached
+from qualkit.clean import map_unique
+from qualkit.resources import require
 
 
-def add_sentiment_score(data, column, filter=None):
+def add_sentiment_score(data, column, filter=None, dedupe=False, cache=None):
+    require('vader_lexicon')
     data = data.copy()
     sia = SentimentIntensityAnalyzer()
-    data['sentiment'] = data[column].apply(lambda x: sia.polarity_scores(x)['compound'])
+    if cache is not None:
+        data['sentiment'] = map_cached(data[column], lambda x: sia.polarity_scores(x)['compound'], cache,
+                                       config_hash('sentiment', nltk.__version__))
+    elif dedupe:
+        data['sentiment'] = map_unique(data[column], lambda x: sia.polarity_scores(x)['compound'])
+    else:
+        data['sentiment'] = data[column].apply(lambda x: sia.polarity_scores(x)['compound'])
     if filter == 'positive':
         data.drop(data.index[data['sentiment'] < 0.3], inplace=True)
     elif filter == 'negative':
@@ -1,26 +1,44 @@
+from functools import lru_cache
+
 import nltk
 
-nltk.download('wordnet')
-nltk.download('stopwords')
+from qualkit.resources import require
+
+# additional terms missing from the nltk stopwords
+EXTRA_STOPWORDS = [
+    'a', 'b', 'c', 'd', 'e', 'f', 'g', 'h', 'i', 'j', 'k', 'l', 'm', 'n', 'o', 'p', 'q', 'r', 's', 't', 'u', 'v', 'w',
+    'x', 'y', 'z', "about", "across", "after", "all", "also", "an", "and", "another", "added",
+    "any", "are", "as", "at", "basically", "be", "because", 'become', "been", "before", "being", "between", "both",
+    "but", "by", "came", "can", "come", "could", "did", "do", "does", "each", "else", "every", "either", "especially",
+    "for", "from", "get", "given", "gets",
+    'give', 'gives', "got", "goes", "had", "has", "have", "he", "her", "here", "him", "himself", "his", "how", "if",
+    "in", "into", "is", "it", "its", "just", "lands", "like", "make", "making", "made", "many", "may", "me", "might",
+    "more", "most", "much", "must", "my", "never", "perhaps", "no", "now", "of", "on", "only", "or", "other", "our", "out", "over", "re", "said", "same",
+    "see", "should", "since", "so", "some", "still", "such", "seeing", "see", "take", "than", "that", "the", "their",
+    "them", "then", "there",
+    "these", "they", "this", "those", "through", "to", "too", "under", "up", "use", "using", "used", "underway",
+    "very", "want", "was", "way", "we", "well", "were", "what", "when", "where", "which", "while", "whilst", "who",
+    "will", "with", "would", "you", "your", "i", "i m", "im",
+    'ha', 'le', 'u', 'wa',
+    'etc', 'via', 'eg', 'e g', 'ie']
+
 
-# initiate stopwords from nltk
-stopwords = nltk.corpus.stopwords.words('english')
+@lru_cache(maxsize=None)
+def get_stopwords():
+    """
+    Get the standard set of stopwords: the nltk English stopwords plus EXTRA_STOPWORDS.
+    The nltk corpus is only loaded the first time this is called, and the same list is
+    returned every time, so terms added to it are used by all the qualkit modules
+    :return: the list of stopwords
+    """
+    require('stopwords')
+    stopwords = nltk.corpus.stopwords.words('english')
+    stopwords.extend(EXTRA_STOPWORDS)
+    return stopwords
 
-# add additional missing terms
-stopwords.extend(
-    ['a', 'b', 'c', 'd', 'e', 'f', 'g', 'h', 'i', 'j', 'k', 'l', 'm', 'n', 'o', 'p', 'q', 'r', 's', 't', 'u', 'v', 'w',
-     'x', 'y', 'z', "about", "across", "after", "all", "also", "an", "and", "another", "added",
-     "any", "are", "as", "at", "basically", "be", "because", 'become', "been", "before", "being", "between", "both",
-     "but", "by", "came", "can", "come", "could", "did", "do", "does", "each", "else", "every", "either", "especially",
-     "for", "from", "get", "given", "gets",
-     'give', 'gives', "got", "goes", "had", "has", "have", "he", "her", "here", "him", "himself", "his", "how", "if",
-     "in", "into", "is", "it", "its", "just", "lands", "like", "make", "making", "made", "many", "may", "me", "might",
-     "more", "most", "much", "must", "my", "never", "perhaps", "no", "now", "of", "on", "only", "or", "other", "our", "out", "over", "re", "said", "same",
-     "see", "should", "since", "so", "some", "still", "such", "seeing", "see", "take", "than", "that", "the", "their",
-     "them", "then", "there",
-     "these", "they", "this", "those", "through", "to", "too", "under", "up", "use", "using", "used", "underway",
-     "very", "want", "was", "way", "we", "well", "were", "what", "when", "where", "which", "while", "whilst", "who",
-     "will", "with", "would", "you", "your", "i", "i m", "im",
-     'ha', 'le', 'u', 'wa',
-     'etc', 'via', 'eg', 'e g', 'ie'])
 
+def __getattr__(name):
+    # 'stopwords' is loaded on first access rather than when the module is imported
+    if name == 'stopwords':
+        return get_stopwords()
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
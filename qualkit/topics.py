@@ -4,35 +4,105 @@ import nltk
 from nltk.stem import WordNetLemmatizer
 from nltk import ngrams
 from rake_nltk import Rake
-from sklearn.feature_extraction.text import CountVectorizer
-from sklearn.decomposition import LatentDirichletAllocation
 import collections
-
-from qualkit.stopwords import stopwords
-
-nltk.download('wordnet')
+import json
+import os
+import re
+import tempfile
+import time
+from contextlib import closing
+from functools import lru_cache
+
+from qualkit import parallel
+from qualkit.coherence import topic_coherence
+from qualkit.resources import require
+from qualkit.stopwords import get_stopwords
+from qualkit.topk import feature_names, top_indices, top_terms
 
 # The code for combining LDA and RAKE is based upon Lowri Williams' method described here:
 # https://github.com/LowriWilliams/Topic_Modelling_Beyond_Tokens/
 
-# initiate stopwords
-stop_words = stopwords
-
 # initiate nltk lemmatiser
 wordnet_lemmatizer = WordNetLemmatizer()
 
-
-def convert_to_tokens(data):
+# The default token pattern of scikit-learn's CountVectorizer
+TOKEN_PATTERN = re.compile(r'(?u)\b\w\w+\b')
+
+
+def __getattr__(name):
+    # stopwords are loaded on first use rather than when the module is imported
+    if name == 'stop_words':
+        return get_stopwords()
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+
+
+def __require_resources__():
+    for name in ('punkt', 'wordnet', 'omw-1.4'):
+        require(name)
+
+
+@lru_cache(maxsize=100000)
+def __lemma__(word):
+    return wordnet_lemmatizer.lemmatize(word)
+
+
+class TokenAnalyzer:
+    """
+    Turns a cleaned string into the terms counted by the topic model in a single pass:
+    the string is tokenised, stopwords are dropped with a set lookup, and each word is
+    lemmatised (with the lemmas of words already seen remembered). The analyzer can be
+    given to CountVectorizer directly, so the text is only ever tokenised once
+    """
+
+    def __init__(self, stop_words=None, ngram_range=(1, 2)):
+        """
+        :param stop_words: (optional) the words to drop; defaults to the qualkit stopwords
+        :param ngram_range: the smallest and largest n-grams to count
+        """
+        if stop_words is None:
+            stop_words = get_stopwords()
+        self.stop_words = frozenset(stop_words)
+        self.ngram_range = ngram_range
+
+    def tokens(self, text):
+        """
+        :param text: a cleaned string
+        :return: the lemmatised tokens of the string, without stopwords
+        """
+        return [__lemma__(token) for token in nltk.word_tokenize(text) if token not in self.stop_words]
+
+    def ngrams(self, tokens):
+        """
+        Build the terms for a list of tokens in the same way as CountVectorizer(analyzer='word'),
+        i.e. lowercase words of at least two characters, followed by the longer n-grams
+        :param tokens: a list of tokens, as returned by tokens()
+        :return: a list of terms
+        """
+        words = []
+        for token in tokens:
+            words.extend(TOKEN_PATTERN.findall(token.lower()))
+        low, high = self.ngram_range
+        terms = list(words) if low == 1 else []
+        for n in range(max(low, 2), high + 1):
+            terms.extend(' '.join(words[i:i + n]) for i in range(len(words) - n + 1))
+        return terms
+
+    def __call__(self, text):
+        """
+        :param text: a cleaned string
+        :return: the terms to count for the string
+        """
+        return self.ngrams(self.tokens(text))
+
+
+def convert_to_tokens(data, analyzer=None):
+    __require_resources__()
+    if analyzer is None:
+        analyzer = TokenAnalyzer()
     df = data.copy()
 
-    # tokenise string
-    df['tokens'] = df['cleaned'].apply(lambda x: nltk.word_tokenize(x))
-
-    # remove stopwords
-    df['tokens'] = df['tokens'].apply(lambda x: [item for item in x if item not in stop_words])
-
-    # lemmatise words
-    df['tokens'] = df['tokens'].apply(lambda x: [wordnet_lemmatizer.lemmatize(y) for y in x])
+    # tokenise string, remove stopwords and lemmatise words
+    df['tokens'] = [analyzer.tokens(x) for x in df['cleaned']]
 
     # Remove nulls
     df['tokens'].replace('', np.nan, inplace=True)
@@ -41,13 +111,16 @@ def convert_to_tokens(data):
     return df
 
 
-def create_lda_model(num_topics=10):
-    # initisalise LDA Model
+def create_lda_model(num_topics=10, **params):
+    from sklearn.decomposition import LatentDirichletAllocation
+
+    # initisalise LDA Model; params, e.g. learning_method='online', override the defaults
+    defaults = dict(random_state=10,          # random state
+                    evaluate_every=-1,        # compute perplexity every n iters, default: Don't
+                    n_jobs=-1,                # Use all available CPUs
+                    )
     lda_model = LatentDirichletAllocation(n_components=num_topics, # number of topics
-                                      random_state=10,          # random state
-                                      evaluate_every=-1,      # compute perplexity every n iters, default: Don't
-                                      n_jobs=-1,              # Use all available CPUs
-                                     )
+                                          **dict(defaults, **params))
 
     return lda_model
 
@@ -79,186 +152,464 @@ def remove_duplicates(topic_keywords):
     return topic_keywords_processed
 
 
-def add_keywords_to_topics(data):
+def add_keywords_to_topics(data, n_jobs=1):
+    __require_resources__()
     df = data.copy()
-    all_results = []
+    topics = [(df[df['Dominant_topic'] == i], i) for i in df['Dominant_topic'].unique()]
 
-    for i in df['Dominant_topic'].unique():
-        topic = df[df['Dominant_topic'] == i]
-        topic = topic.copy()
-
-        key_words = []
-        topic.dropna(inplace=True)
-
-        # run keyword extraction
-        for j in topic['cleaned'].values.tolist():
-            r = Rake(stopwords=stop_words)
-
-            a = r.extract_keywords_from_text(j)
-            c = r.get_ranked_phrases_with_scores()
-
-            for k in c:
-                if k not in key_words:
-                    key_words.append(k)
-
-        key_words = pd.DataFrame(key_words, columns=['score', 'term'])
-        key_words = key_words.sort_values('score', ascending=False)
-        key_words = key_words.drop_duplicates(subset=['term'])
-        key_words['topic_number'] = i
-        key_words['term_list'] =  key_words.term.apply(lambda x: x.split())
-
-        # find bigrams from key words to match against topic modelling output
-        tmp_keywords = []
-        for j in key_words.values.tolist():
-            tmp = []
-            bi_grams = ngrams(j[3], 2)
-            for g in bi_grams:
-                tmp.append(' '.join(g))
-            for k in j[3]:
-                # lemmatise words to match the lemmatised output of the topic modelling word extraction
-                tmp.append(wordnet_lemmatizer.lemmatize(k))
-            j.remove(j[3])
-            j.append(list(set(tmp)))
-            tmp_keywords.append(j)
-
-        # mask key words against topic modelling output
-        key_words = pd.DataFrame(tmp_keywords, columns=['score', 'term', 'topic_number', 'term_list'])
-        topic_keywords = topic['Topic_keywords'].values.tolist()
-        topic_keywords = [item for sublist in topic_keywords for item in sublist]
-        topic_keywords = list(set(topic_keywords))
+    # the topics are independent, so they can be processed in any order; start the largest
+    # ones first to keep the workers busy, then put the results back in topic order
+    order = sorted(range(len(topics)), key=lambda n: len(topics[n][0]), reverse=True)
+    results = parallel.map_chunks(__topic_keywords__, [topics[n] for n in order], n_jobs,
+                                  initializer=__require_resources__)
+    by_topic = dict(zip(order, results))
 
-        tmp = []
-
-        for t in topic_keywords:
-
-            mask = key_words.term_list.apply(lambda x: t in x)
-            key_words_processed = key_words[mask]
-
-            if key_words_processed.empty:
-                pass
-            else:
-                for j in key_words_processed[['score', 'term', 'topic_number', 'term_list']].values.tolist():
-                    if j not in tmp:
-                        tmp.append(j)
-
-        key_words = pd.DataFrame(tmp, columns=['score', 'term', 'topic_number', 'term_list'])
+    all_results = []
+    for n in range(len(topics)):
+        all_results.extend(by_topic[n])
+    return all_results
 
-        # select the max score as the topic title
-        top_key_words = key_words[key_words.score == key_words['score'].max()]
 
-        # select the remaining keywords as child terms
-        remaining_keywords = key_words[key_words.score != key_words['score'].max()]
+@lru_cache(maxsize=None)
+def __keyword_extractor__():
+    # one RAKE extractor per process, reused for every response
+    return Rake(stopwords=get_stopwords())
 
-        # if there are more than 1 keyword in the topic title, aggregate them with a / as a separatore
-        top_key_words = top_key_words.copy()
-        top_key_words = top_key_words.groupby(['score', 'topic_number']).agg({'term' : lambda x: ' / '.join(map(str, x))})
-        top_key_words = top_key_words.reset_index()
-        top_key_words['parent'] = ''
 
-        # add 0.1 to the child keywords to identify then in the merged dataframe
-        remaining_keywords = remaining_keywords.copy()
-        remaining_keywords['topic_number'] = remaining_keywords['topic_number'] + 0.1
-        remaining_keywords['parent'] = top_key_words['term'].values.tolist()[0]
+def __topic_keywords__(args):
+    # the keywords of a single topic, as a list of records
+    topic, i = args
+    rake = __keyword_extractor__()
+    topic = topic.dropna()
 
-        all_topics = pd.concat([top_key_words, remaining_keywords], sort=False)
+    # run keyword extraction, keeping the first occurrence of each (score, phrase) pair
+    key_words = {}
+    for j in topic['cleaned'].values.tolist():
+        rake.extract_keywords_from_text(j)
+        for k in rake.get_ranked_phrases_with_scores():
+            key_words.setdefault(k, None)
 
-        for t in all_topics.to_dict(orient='records'):
-            all_results.append(t)
+    key_words = pd.DataFrame(list(key_words), columns=['score', 'term'])
+    key_words = key_words.sort_values('score', ascending=False)
+    key_words = key_words.drop_duplicates(subset=['term'])
 
-    return all_results
+    # find bigrams from key words to match against topic modelling output, and
+    # index the keywords by each of their bigrams and lemmatised words
+    rows = []
+    index = collections.defaultdict(list)
+    for score, term in zip(key_words['score'].tolist(), key_words['term'].tolist()):
+        words = term.split()
+        tmp = [' '.join(g) for g in ngrams(words, 2)]
+        # lemmatise words to match the lemmatised output of the topic modelling word extraction
+        tmp.extend(__lemma__(k) for k in words)
+        term_list = list(set(tmp))
+        for t in term_list:
+            index[t].append(len(rows))
+        rows.append([score, term, i, term_list])
 
+    # mask key words against topic modelling output
+    topic_keywords = topic['Topic_keywords'].values.tolist()
+    topic_keywords = [item for sublist in topic_keywords for item in sublist]
+    topic_keywords = list(set(topic_keywords))
 
-#
-# Extracts the features from the trained model along with
-# their weights
-#
-def lda_features(lda_model, vectorizer):
-    top_feature_data = []
-    for topic_idx, topic in enumerate(lda_model.components_):
-        top_features_ind = topic.argsort()[:-10 - 1:-1]
-        top_features = [vectorizer.get_feature_names()[i] for i in top_features_ind]
-        weights = topic[top_features_ind]
-        for i in range(0, topic_idx+1):
-            top_feature_data.append(
-                {
-                    "topic": topic_idx+1,
-                    "features": top_features[i],
-                    "weights": weights[i]
-                }
-            )
-    return pd.DataFrame(top_feature_data)
-
-
-def lda(data, sentiment='positive', num_topics=12, output='default'):
-    df = data.copy()
-    df = convert_to_tokens(df)
+    matched = {}
+    for t in topic_keywords:
+        for row in index.get(t, ()):
+            matched.setdefault(row, None)
 
-    # Build the model
-    lda_model = create_lda_model(num_topics=num_topics)
+    key_words = pd.DataFrame([rows[row] for row in matched], columns=['score', 'term', 'topic_number', 'term_list'])
 
-    # initialise the count vectorizer
-    vectorizer = CountVectorizer(analyzer='word', ngram_range=(1, 2))
+    # select the max score as the topic title
+    top_key_words = key_words[key_words.score == key_words['score'].max()]
 
-    # join the processed data to be vectorised
-    vectors = []
-    for index, row in df.iterrows():
-        vectors.append(", ".join(row['tokens']))
-    vectorised = vectorizer.fit_transform(vectors)
+    # select the remaining keywords as child terms
+    remaining_keywords = key_words[key_words.score != key_words['score'].max()]
 
-    # Apply model to vectorised tokens
-    lda_output = lda_model.fit_transform(vectorised)
+    # if there are more than 1 keyword in the topic title, aggregate them with a / as a separatore
+    top_key_words = top_key_words.copy()
+    top_key_words = top_key_words.groupby(['score', 'topic_number']).agg({'term' : lambda x: ' / '.join(map(str, x))})
+    top_key_words = top_key_words.reset_index()
+    top_key_words['parent'] = ''
 
-    if output == 'features':
-        return lda_features(lda_model, vectorizer)
+    # add 0.1 to the child keywords to identify then in the merged dataframe
+    remaining_keywords = remaining_keywords.copy()
+    remaining_keywords['topic_number'] = remaining_keywords['topic_number'] + 0.1
+    remaining_keywords['parent'] = top_key_words['term'].values.tolist()[0]
 
-    # Add column names
-    topic_names = ["Topic" + str(i) for i in range(1, lda_model.n_components + 1)]
+    all_topics = pd.concat([top_key_words, remaining_keywords], sort=False)
 
-    # make the pandas dataframe
-    df_document_topic = pd.DataFrame(np.round(lda_output, 2), columns = topic_names)
+    return all_topics.to_dict(orient='records')
 
-    # get dominant topic for each document
-    dominant_topic = (np.argmax(df_document_topic.values, axis=1)+1)
-    df_document_topic['Dominant_topic'] = dominant_topic
 
-    # join to original dataframes
-    df = pd.merge(df, df_document_topic, left_index = True, right_index = True, how = 'outer')
+#
+# Extracts the features from the trained model along with
+# their weights
+#
+def lda_features(lda_model, vectorizer, k=10):
+    return __lda_features__(lda_model.components_, feature_names(vectorizer), k)
+
+
+def __lda_features__(components, feature_names, k):
+    # the top k features of every topic, ranked, with the original column names
+    features = top_terms(components, feature_names, k)
+    return features.rename(columns={'term': 'features', 'weight': 'weights'})
+
+
+class LdaTopicModel:
+    """
+    An LDA topic model that is trained once and can then be used to score any number of
+    new responses, without retraining. A trained model can be saved to a directory and
+    loaded again later; the large arrays are memory-mapped when the model is loaded
+    """
+
+    def __init__(self, num_topics=12, analyzer=None):
+        """
+        :param num_topics: the number of topics
+        :param analyzer: (optional) the TokenAnalyzer used to turn the 'cleaned' column into terms
+        """
+        self.num_topics = num_topics
+        self.analyzer = analyzer
+        self.vectorizer = None
+        self.model = None
+        self.feature_names = None
+        self.topic_keywords = None
+
+    def fit(self, data):
+        """
+        Train the model
+        :param data: a DataFrame with a 'cleaned' column
+        :return: the model
+        """
+        df = convert_to_tokens(data, self.__analyzer__())
+        vectorised = self.__fit_vectorizer__(df)
+        self.model.fit(vectorised)
+        self.__set_keywords__()
+        return self
+
+    def transform(self, data) -> pd.DataFrame:
+        """
+        Score responses against the trained topics
+        :param data: a DataFrame with a 'cleaned' column
+        :return: the DataFrame with its tokens, a weight for each topic, the Dominant_topic and
+        its Topic_number and Topic_keywords
+        """
+        df = convert_to_tokens(data, self.__analyzer__())
+        return self.__assign_topics__(df, self.model.transform(self.vectorizer.transform(df['tokens'])))
+
+    def fit_transform(self, data) -> pd.DataFrame:
+        """
+        Train the model and score the responses it was trained on
+        :param data: a DataFrame with a 'cleaned' column
+        :return: as for transform
+        """
+        df = convert_to_tokens(data, self.__analyzer__())
+        vectorised = self.__fit_vectorizer__(df)
+        lda_output = self.model.fit_transform(vectorised)
+        self.__set_keywords__()
+        return self.__assign_topics__(df, lda_output)
+
+    def fit_stream(self, chunks, vocabulary=None, min_df=1, passes=1, callback=None, **lda_params):
+        """
+        Train the model on data too large to hold in memory, using online (mini-batch) LDA.
+        Unless a vocabulary is given, a first pass over the chunks collects the vocabulary; each
+        pass after that vectorizes one chunk at a time and updates the model with partial_fit,
+        so memory use depends on the chunk and vocabulary sizes rather than the size of the data
+        :param chunks: a function returning a fresh iterable of DataFrames with a 'cleaned' column each time
+        it is called, e.g. lambda: pd.read_csv(path, chunksize=100000); or a list of DataFrames. A
+        one-off iterator such as a generator can only be used if a vocabulary is given and passes is 1
+        :param vocabulary: (optional) a fixed list of terms to count, skipping the vocabulary pass
+        :param min_df: the minimum number of responses a term must appear in to be counted
+        :param passes: the number of training passes over the chunks
+        :param callback: (optional) a function called after each chunk with the pass number, the number of
+        chunks and the number of responses used so far in that pass
+        :param lda_params: any further parameters for LatentDirichletAllocation, e.g. batch_size or total_samples
+        :return: the model
+        """
+        from sklearn.feature_extraction.text import CountVectorizer
+
+        if not callable(chunks) and iter(chunks) is chunks and (vocabulary is None or passes > 1):
+            raise ValueError('chunks can only be read once; pass a function returning the chunks, or a vocabulary')
+
+        analyzer = self.__analyzer__()
+        if vocabulary is None:
+            vocabulary = self.__stream_vocabulary__(__iterate__(chunks), min_df)
+
+        self.vectorizer = CountVectorizer(analyzer=analyzer.ngrams,
+                                          vocabulary={term: i for i, term in enumerate(vocabulary)})
+        self.feature_names = np.array(vocabulary)
+        self.model = create_lda_model(num_topics=self.num_topics, learning_method='online', **lda_params)
+
+        for number in range(1, passes + 1):
+            documents = 0
+            for count, chunk in enumerate(__iterate__(chunks), 1):
+                df = convert_to_tokens(chunk, analyzer)
+                if len(df):
+                    self.model.partial_fit(self.vectorizer.transform(df['tokens']))
+                documents += len(df)
+                if callback is not None:
+                    callback(number, count, documents)
+
+        self.__set_keywords__()
+        return self
+
+    def __stream_vocabulary__(self, chunks, min_df):
+        document_frequency = collections.Counter()
+        for chunk in chunks:
+            df = convert_to_tokens(chunk, self.analyzer)
+            for tokens in df['tokens']:
+                document_frequency.update(set(self.analyzer.ngrams(tokens)))
+        return sorted(term for term, count in document_frequency.items() if count >= min_df)
+
+    def features(self, k=10) -> pd.DataFrame:
+        """
+        :param k: the number of features to return for each topic
+        :return: the top features of each topic with their rank and weight, as for lda(output='features')
+        """
+        return __lda_features__(self.model.components_, self.feature_names, k)
+
+    def coherence(self, data, n_terms=10) -> pd.DataFrame:
+        """
+        Measure the coherence of each topic on a set of responses (see qualkit.coherence)
+        :param data: a DataFrame with a 'cleaned' column, e.g. the training data
+        :param n_terms: the number of top terms of each topic to use
+        :return: a DataFrame with 'topic', 'npmi' and 'umass' columns
+        """
+        df = convert_to_tokens(data, self.__analyzer__())
+        top_term_locs, _ = top_indices(self.model.components_, n_terms)
+        return topic_coherence(self.vectorizer.transform(df['tokens']), top_term_locs)
+
+    def save(self, path):
+        """
+        Save the trained model to a directory, which is created if necessary. LDA parameters that
+        can't be written as JSON, such as a RandomState, are only used for training and are left out
+        :param path: the directory
+        """
+        os.makedirs(path, exist_ok=True)
+        params = {
+            'num_topics': self.num_topics,
+            'ngram_range': list(self.analyzer.ngram_range),
+            'stop_words': sorted(self.analyzer.stop_words),
+            'lda': __json_params__(self.model.get_params()),
+            'doc_topic_prior_': self.model.doc_topic_prior_,
+            'topic_word_prior_': self.model.topic_word_prior_,
+        }
+        with open(os.path.join(path, 'params.json'), 'w') as f:
+            json.dump(params, f)
+        with open(os.path.join(path, 'vocabulary.json'), 'w') as f:
+            json.dump(self.feature_names.tolist(), f)
+        np.save(os.path.join(path, 'components.npy'), self.model.components_)
+        np.save(os.path.join(path, 'exp_dirichlet_component.npy'), self.model.exp_dirichlet_component_)
+
+    @classmethod
+    def load(cls, path, mmap_mode='r'):
+        """
+        Load a model saved with save()
+        :param path: the directory the model was saved to
+        :param mmap_mode: how to memory-map the arrays (see numpy.load); None reads them into memory
+        :return: the model
+        """
+        from sklearn.decomposition import LatentDirichletAllocation
+        from sklearn.feature_extraction.text import CountVectorizer
+
+        with open(os.path.join(path, 'params.json')) as f:
+            params = json.load(f)
+        with open(os.path.join(path, 'vocabulary.json')) as f:
+            vocabulary = json.load(f)
+
+        model = cls(params['num_topics'], TokenAnalyzer(params['stop_words'], tuple(params['ngram_range'])))
+        model.vectorizer = CountVectorizer(analyzer=model.analyzer.ngrams,
+                                           vocabulary={term: i for i, term in enumerate(vocabulary)})
+        model.feature_names = np.array(vocabulary)
+
+        # restore the fitted state that LatentDirichletAllocation.transform needs
+        model.model = LatentDirichletAllocation(**params['lda'])
+        model.model.components_ = np.load(os.path.join(path, 'components.npy'), mmap_mode=mmap_mode)
+        model.model.exp_dirichlet_component_ = np.load(os.path.join(path, 'exp_dirichlet_component.npy'),
+                                                       mmap_mode=mmap_mode)
+        model.model.doc_topic_prior_ = params['doc_topic_prior_']
+        model.model.topic_word_prior_ = params['topic_word_prior_']
+        model.model.n_features_in_ = len(vocabulary)
+        model.__set_keywords__()
+        return model
+
+    def __analyzer__(self):
+        if self.analyzer is None:
+            self.analyzer = TokenAnalyzer()
+        return self.analyzer
+
+    def __fit_vectorizer__(self, df):
+        from sklearn.feature_extraction.text import CountVectorizer
+
+        # Build the model
+        self.model = create_lda_model(num_topics=self.num_topics)
+
+        # initialise the count vectorizer, which takes the tokens as they are
+        self.vectorizer = CountVectorizer(analyzer=self.analyzer.ngrams)
+        vectorised = self.vectorizer.fit_transform(df['tokens'])
+        vocabulary = self.vectorizer.vocabulary_
+        self.feature_names = np.array(sorted(vocabulary, key=vocabulary.get))
+        return vectorised
+
+    def __set_keywords__(self):
+        top_keyword_locs, _ = top_indices(self.model.components_, 20)
+        topic_keywords = remove_duplicates(self.feature_names[top_keyword_locs])
+
+        # Topic - Keywords Dataframe
+        df_topic_keywords = pd.DataFrame(topic_keywords)
+        df_topic_keywords.columns = ['Term '+ str(i) for i in range(1, df_topic_keywords.shape[1] + 1)]
+        df_topic_keywords['Topic_keywords'] = df_topic_keywords.values.tolist()
+        df_topic_keywords['Topic_number'] = df_topic_keywords.index + 1
+        df_topic_keywords = df_topic_keywords[['Topic_keywords', 'Topic_number']]
+
+        # Remove None from lists
+        tmp = []
 
-    keywords = np.array(vectorizer.get_feature_names())
+        for i in df_topic_keywords['Topic_keywords']:
+            tmp.append([x for x in i if x is not None])
 
-    topic_keywords = []
+        df_topic_keywords['Topic_keywords'] = tmp
+        self.topic_keywords = df_topic_keywords
 
-    for topic_weights in lda_model.components_:
-        top_keyword_locs = (-topic_weights).argsort()[:20]
-        topic_keywords.append(keywords.take(top_keyword_locs))
+    def __assign_topics__(self, df, lda_output):
+        # Add column names
+        topic_names = ["Topic" + str(i) for i in range(1, self.num_topics + 1)]
 
-    topic_keywords = remove_duplicates(topic_keywords)
+        # make the pandas dataframe, lined up with the rows it was computed from
+        df_document_topic = pd.DataFrame(np.round(lda_output, 2), columns=topic_names, index=df.index)
 
-    # Topic - Keywords Dataframe
-    df_topic_keywords = pd.DataFrame(topic_keywords)
-    df_topic_keywords.columns = ['Term '+ str(i) for i in range(1, df_topic_keywords.shape[1] + 1)]
-    df_topic_keywords['Topic_keywords'] = df_topic_keywords.values.tolist()
-    df_topic_keywords['Topic_number'] = df_topic_keywords.index + 1
-    df_topic_keywords = df_topic_keywords[['Topic_keywords', 'Topic_number']]
+        # get dominant topic for each document
+        dominant_topic = (np.argmax(df_document_topic.values, axis=1)+1)
+        df_document_topic['Dominant_topic'] = dominant_topic
 
-    # Remove None from lists
-    tmp = []
+        # join to original dataframes
+        df = pd.merge(df, df_document_topic, left_index = True, right_index = True, how = 'outer')
 
-    for i in df_topic_keywords['Topic_keywords']:
-        tmp.append([x for x in i if x is not None])
+        # Merge key terms back to main frame
+        return pd.merge(df, self.topic_keywords, left_on='Dominant_topic', right_on='Topic_number')
 
-    df_topic_keywords['Topic_keywords'] = tmp
 
-    # Merge key terms back to main frame
-    df = pd.merge(df, df_topic_keywords, left_on='Dominant_topic', right_on='Topic_number')
+def __iterate__(chunks):
+    # chunks is either a function returning a fresh iterable of DataFrames, or an iterable
+    return chunks() if callable(chunks) else chunks
 
-    return df
 
+def lda(data, sentiment='positive', num_topics=12, output='default', n_features=10):
+    model = LdaTopicModel(num_topics)
 
-def lda_with_keywords(data):
+    if output == 'features':
+        return model.fit(data).features(n_features)
+
+    return model.fit_transform(data)
+
+
+def lda_chunks(chunks, num_topics=12, vocabulary=None, min_df=1, passes=1, callback=None, **lda_params):
+    """
+    The streaming version of lda() for data too large to hold in memory. An online LDA model
+    is trained on the chunks (see LdaTopicModel.fit_stream), then each chunk is read again and
+    yielded with its topics
+    :param chunks: a function returning a fresh iterable of DataFrames with a 'cleaned' column each time
+    it is called, or a list of DataFrames
+    :return: a generator of DataFrames, as returned by lda()
+
+    See LdaTopicModel.fit_stream for the remaining parameters.
+    """
+    if not callable(chunks) and iter(chunks) is chunks:
+        raise ValueError('chunks can only be read once; pass a function returning the chunks')
+    model = LdaTopicModel(num_topics).fit_stream(chunks, vocabulary, min_df, passes, callback, **lda_params)
+    for chunk in __iterate__(chunks):
+        yield model.transform(chunk)
+
+
+def lda_topic_sweep(data, k_range=range(2, 21), n_jobs=1, early_stop=None, patience=1, callback=None, **lda_params):
+    """
+    Fits an LDA model for each number of topics in k_range to help decide how many topics
+    to use. The data is tokenised and vectorised only once, and the document-term matrix is
+    shared with the worker processes through memory-mapped files rather than copied
+    :param data: a DataFrame with a 'cleaned' column
+    :param k_range: the numbers of topics to try, in order
+    :param n_jobs: the number of models to fit at the same time; -1 uses one process per CPU
+    :param early_stop: (optional) stop once the perplexity improves by less than this fraction
+    (e.g. 0.01 for 1%) on the best so far, for patience numbers of topics in a row
+    :param patience: see early_stop
+    :param callback: (optional) a function called with the result for each number of topics as it
+    is ready; by default the perplexity is printed
+    :param lda_params: any further parameters for LatentDirichletAllocation
+    :return: a list of dicts, one per number of topics fitted, with 'topics', 'perplexity',
+    'log_likelihood', the mean topic coherence of the top ten terms ('npmi' and 'umass'),
+    'n_iter' and 'fit_time' (in seconds)
+    """
+    from sklearn.feature_extraction.text import CountVectorizer
+
+    analyzer = TokenAnalyzer()
+    df = convert_to_tokens(data, analyzer)
+    vectorised = CountVectorizer(analyzer=analyzer.ngrams).fit_transform(df['tokens']).tocsr()
+    if callback is None:
+        callback = __print_sweep_result__
+    if parallel.effective_n_jobs(n_jobs) > 1:
+        # the models are fitted side by side, so each should use a single process
+        lda_params = dict({'n_jobs': 1}, **lda_params)
+
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        shared = parallel.share_csr(vectorised, directory)
+        tasks = [(shared, k, lda_params) for k in k_range]
+        best = None
+        plateau = 0
+        # closing the generator when stopping early cancels the models not yet started
+        with closing(parallel.imap(__fit_topic_count__, tasks, n_jobs)) as fitted:
+            for result in fitted:
+                results.append(result)
+                callback(result)
+                if early_stop is not None:
+                    if best is not None and (best - result['perplexity']) < early_stop * best:
+                        plateau += 1
+                    else:
+                        plateau = 0
+                    if best is None or result['perplexity'] < best:
+                        best = result['perplexity']
+                    if plateau >= patience:
+                        break
+    return results
+
+
+def __json_params__(params):
+    # keep the parameters that can be written as JSON, turning numpy scalars into Python ones
+    json_params = {}
+    for name, value in params.items():
+        if isinstance(value, np.generic):
+            value = value.item()
+        if value is None or isinstance(value, (bool, int, float, str)):
+            json_params[name] = value
+    return json_params
+
+
+def __fit_topic_count__(task):
+    shared, k, lda_params = task
+    vectorised = parallel.load_csr(shared)
+    start = time.perf_counter()
+    lda_model = create_lda_model(num_topics=k, **lda_params).fit(vectorised)
+    fit_time = time.perf_counter() - start
+    top_term_locs, _ = top_indices(lda_model.components_, 10)
+    _, coherence = topic_coherence(vectorised, top_term_locs, overall=True)
+    return {
+        'topics': k,
+        'perplexity': lda_model.perplexity(vectorised),
+        'log_likelihood': lda_model.score(vectorised),
+        'npmi': coherence['npmi'],
+        'umass': coherence['umass'],
+        'n_iter': lda_model.n_iter_,
+        'fit_time': fit_time
+    }
+
+
+def __print_sweep_result__(result):
+    print("Perplexity with " + str(result['topics']) + " topics = " + str(result['perplexity']))
+
+
+def lda_with_keywords(data, n_jobs=1):
     df = data.copy()
-    # Add keywords to topics
-    all_results = add_keywords_to_topics(df)
+    # Add keywords to topics, using n_jobs worker processes (-1 for one per CPU)
+    all_results = add_keywords_to_topics(df, n_jobs)
 
     all_topics_df = pd.DataFrame(all_results)
     all_topics_df = all_topics_df.sort_values('topic_number', ascending=True)
@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+
+
+def top_indices(weights, k=10):
+    """
+    Find the k largest weights in each row of a topic-term matrix. The whole matrix is
+    partitioned at once with argpartition to find each row's k-th largest weight, and only
+    the weights at least that large are sorted; ties are broken in favour of the lower column
+    index, including ties at the k-th weight
+    :param weights: a 2D array with one row per topic and one column per term
+    :param k: the number of terms to keep for each topic
+    :return: a tuple of two arrays with one row per topic and min(k, number of terms) columns:
+    the column indices of the top terms, largest weight first, and their weights
+    """
+    weights = np.asarray(weights)
+    k = max(0, min(k, weights.shape[1]))
+    if k == 0:
+        empty = np.empty((len(weights), 0), dtype=int)
+        return empty, np.take_along_axis(weights, empty, axis=1)
+    if k == weights.shape[1]:
+        rows, columns = np.indices(weights.shape).reshape(2, -1)
+    else:
+        # argpartition keeps an arbitrary choice of the entries tied with the k-th weight, so keep
+        # all of them and choose by column index when sorting
+        kth = np.take_along_axis(weights, np.argpartition(-weights, k - 1, axis=1)[:, k - 1:k], axis=1)
+        rows, columns = np.nonzero(weights >= kth)
+    values = weights[rows, columns]
+    order = np.lexsort((columns, -values, rows))
+    # every row has at least k candidates, sorted within the row, so keep the first k of each
+    rank = np.arange(len(order)) - np.searchsorted(rows[order], rows[order])
+    keep = order[rank < k]
+    return columns[keep].reshape(-1, k), values[keep].reshape(-1, k)
+
+def top_terms(weights, vocabulary, k=10) -> pd.DataFrame:
+    """
+    Get the top terms of each topic as a tidy DataFrame
+    :param weights: a 2D array with one row per topic and one column per term, e.g. the
+    components_ of an LDA model
+    :param vocabulary: the terms, in column order
+    :param k: the number of terms to return for each topic
+    :return: a DataFrame with 'topic' and 'rank' columns (both counting from 1), 'term' and 'weight'
+    """
+    indices, values = top_indices(weights, k)
+    topics, ranks = np.indices(indices.shape)
+    return pd.DataFrame({
+        'topic': topics.ravel() + 1,
+        'rank': ranks.ravel() + 1,
+        'term': np.asarray(vocabulary, dtype=object)[indices.ravel()],
+        'weight': values.ravel()
+    })
+
+
+def feature_names(vectorizer):
+    """
+    Get the terms of a fitted scikit-learn vectorizer, in column order, with any version of scikit-learn
+    (get_feature_names was replaced by get_feature_names_out in 1.0 and removed in 1.2)
+    :param vectorizer: a fitted CountVectorizer or TfidfVectorizer
+    :return: an array of the terms
+    """
+    if hasattr(vectorizer, 'get_feature_names_out'):
+        return vectorizer.get_feature_names_out()
+    return np.array(vectorizer.get_feature_names())
@@ -19,6 +19,7 @@ setup(
                         'nltk>=3.6.2',
                         'scikit-learn>=0.24.2',
                         'corextopic>=1.1'],
+    python_requires='>=3.7',
     entry_points={
     },
     classifiers=[
@@ -26,7 +27,6 @@ setup(
         'License :: OSI Approved :: BSD License',
         'Topic :: Scientific/Engineering :: Mathematics',
         'Topic :: Software Development :: Libraries :: Python Modules',
-        'Programming Language :: Python :: 3.6',
         'Programming Language :: Python :: 3.7'
     ]
 )
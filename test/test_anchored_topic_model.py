@@ -1,8 +1,147 @@
+import pandas as pd
+from sklearn.feature_extraction.text import TfidfVectorizer
+
 from qualkit import anchored_topic_model
+from qualkit.cache import TransformCache
+from qualkit.topk import feature_names
+
+
+def sample_data():
+    """
+    :return: a DataFrame of short responses, and a DocumentTermMatrix of them that doesn't need the stopwords
+    """
+    df = pd.DataFrame({'text': ['apple banana pie', 'banana split', 'potato and carrot soup',
+                                'carrot cake', 'onion soup', 'apple crumble'] * 20})
+    vectorizer = TfidfVectorizer(binary=True, norm=None, use_idf=False)
+    return df, anchored_topic_model.DocumentTermMatrix.from_text(df['text'], vectorizer)
 
 
 def test_load_topics():
     df = anchored_topic_model.load_topics('test/topics.csv')
     assert df['topic_name'].size == 3
     assert df['anchors'].loc[0] == ['apple', 'banana']
-    assert df['anchors'].loc[2] == ['potato', 'carrot', 'onion']
\ No newline at end of file
+    assert df['anchors'].loc[2] == ['potato', 'carrot', 'onion']
+
+
+def test_anchored_topic_model_save_load(tmp_path):
+    df, _ = sample_data()
+    model = anchored_topic_model.AnchoredTopicModel(topic_filename='test/topics.csv').fit(df, 'text')
+    model.save(str(tmp_path))
+    loaded = anchored_topic_model.AnchoredTopicModel.load(str(tmp_path))
+    assert loaded.topic_names == model.topic_names
+    assert loaded.topic_labels == model.topic_labels
+    pd.testing.assert_frame_equal(loaded.transform(df, 'text'), model.transform(df, 'text'))
+
+
+def test_anchored_topic_model_save_load_series_topic_names(tmp_path):
+    df, document_terms = sample_data()
+    model = anchored_topic_model.AnchoredTopicModel(topic_names=pd.Series(['none', 'fruit', 'veg']),
+                                                    number_of_topics=2)
+    model.fit(df, 'text', document_terms=document_terms)
+    model.save(str(tmp_path))
+    loaded = anchored_topic_model.AnchoredTopicModel.load(str(tmp_path))
+    assert loaded.topic_names == ['none', 'fruit', 'veg']
+    pd.testing.assert_frame_equal(loaded.transform(df, 'text'), model.transform(df, 'text', document_terms))
+
+
+def test_document_term_matrix_subset():
+    df = pd.DataFrame({'text': ['apple banana', 'banana split', 'apple pie', 'carrot soup', 'onion soup',
+                                'carrot cake', 'apple crumble', 'banana bread']}, index=range(10, 18))
+    vectorizer = TfidfVectorizer(min_df=2, max_df=0.5, binary=True, norm=None, use_idf=False)
+    document_terms = anchored_topic_model.DocumentTermMatrix.from_text(df['text'], vectorizer)
+    subset = df.iloc[[0, 1, 2, 5, 6, 7]]
+    matrix, vocab = document_terms.subset(subset.index).terms()
+    expected = TfidfVectorizer(**vectorizer.get_params()).fit(subset['text'])
+    assert vocab == list(feature_names(expected))
+    assert (matrix != expected.transform(subset['text'])).nnz == 0
+
+
+def test_anchored_topic_model_sample_and_chunks(tmp_path):
+    df, document_terms = sample_data()
+    results = anchored_topic_model.anchored_topic_model(df, 'text', number_of_topics=3, fit_sample_size=50,
+                                                        document_terms=document_terms)
+    chunked = anchored_topic_model.anchored_topic_model(df, 'text', number_of_topics=3, fit_sample_size=50,
+                                                        transform_chunksize=35, document_terms=document_terms)
+    pd.testing.assert_frame_equal(results, chunked)
+    rows = anchored_topic_model.anchored_topic_model(df, 'text', number_of_topics=3, fit_sample_size=50,
+                                                     transform_chunksize=35, document_terms=document_terms,
+                                                     output_file=str(tmp_path / 'topics.csv'))
+    assert rows == len(df)
+    written = pd.read_csv(tmp_path / 'topics.csv', index_col=0)
+    assert written['Topic label'].tolist() == results['Topic label'].tolist()
+
+
+def test_anchored_topic_model_result_dtypes():
+    df, document_terms = sample_data()
+    results = anchored_topic_model.anchored_topic_model(df, 'text', anchors=[['apple'], ['soup']],
+                                                        topic_names=['Fruit', 'Soup'], probability_dtype='float32',
+                                                        document_terms=document_terms)
+    assert results.index.equals(df.index)
+    assert results['Topic name'].dtype == 'category'
+    assert set(results['Topic name']) <= {'No matching topic', 'Fruit', 'Soup'}
+    assert (results.loc[results['topic_1'], 'Topic name'] == 'Fruit').all()
+    assert results['topic_2'].dtype == bool
+    assert results['topic_probability_2'].dtype == 'float32'
+
+
+def test_anchored_topic_model_fit_transform():
+    df, document_terms = sample_data()
+    anchors = [['apple'], ['soup']]
+    results = anchored_topic_model.AnchoredTopicModel(anchors=anchors).fit_transform(df, 'text', document_terms)
+    model = anchored_topic_model.AnchoredTopicModel(anchors=anchors).fit(df, 'text', document_terms)
+    pd.testing.assert_frame_equal(results, model.transform(df, 'text', document_terms))
+
+
+def test_anchor_search(tmp_path):
+    df, document_terms = sample_data()
+    anchor_sets = {'fruit': [['apple', 'banana'], ['soup']], 'veg': [['carrot'], ['onion'], ['potato']]}
+    cache = TransformCache(str(tmp_path))
+    seen = []
+    results = anchored_topic_model.anchor_search(df, 'text', anchor_sets, strengths=(1, 3), cache=cache,
+                                                 callback=seen.append, document_terms=document_terms)
+    assert [(r['anchor_set'], r['anchor_strength']) for r in results] == \
+           [('fruit', 1), ('fruit', 3), ('veg', 1), ('veg', 3)]
+    assert len(seen) == 4
+    assert [len(r['tcs']) for r in results] == [2, 2, 3, 3]
+    assert all(0 <= r['unmatched'] <= 1 for r in results)
+
+    model = anchored_topic_model.AnchoredTopicModel(anchors=anchor_sets['veg'], anchor_strength_int=3)
+    model.fit(df, 'text', document_terms)
+    assert abs(model.model.tc - results[3]['tc']) < 1e-9
+
+    # a repeated search takes every result from the cache
+    again = anchored_topic_model.anchor_search(df, 'text', anchor_sets, strengths=(1, 3), cache=cache,
+                                               callback=seen.append, document_terms=document_terms)
+    assert again == results
+    assert cache.stats()['hits'] == 4
+
+
+def test_anchored_topic_model_numeric_topic_names():
+    df, document_terms = sample_data()
+    results = anchored_topic_model.anchored_topic_model(df, 'text', anchors=[['apple'], ['soup'], ['carrot']],
+                                                        topic_names=[1, 2, 2], document_terms=document_terms)
+    assert list(results['Topic name'].cat.categories) == ['No matching topic', 1, 2]
+    assert (results.loc[results['topic_1'], 'Topic name'] == 1).all()
+
+
+def test_topic_metrics():
+    df, _ = sample_data()
+    seen = []
+    results = anchored_topic_model.topic_metrics(df, 'text', number_of_topics=5, n_jobs=2, callback=seen.append)
+    assert [result['topics'] for result in results] == [1, 2, 3, 4]
+    # the callback gets each result once, in whatever order the models finish
+    assert sorted(result['topics'] for result in seen) == [1, 2, 3, 4]
+    serial = anchored_topic_model.topic_metrics(df, 'text', number_of_topics=5, callback=lambda result: None)
+    assert [result['tc'] for result in results] == [result['tc'] for result in serial]
+
+
+def test_topic_metrics_min_gain():
+    df, _ = sample_data()
+    # no topic can add an infinite gain, so the sweep stops after the second model
+    for n_jobs in (1, 2):
+        results = anchored_topic_model.topic_metrics(df, 'text', number_of_topics=6, n_jobs=n_jobs,
+                                                     callback=lambda result: None, min_gain=float('inf'))
+        assert [result['topics'] for result in results] == [1, 2]
+    results = anchored_topic_model.topic_metrics(df, 'text', number_of_topics=6, callback=lambda result: None,
+                                                 min_gain=float('-inf'))
+    assert [result['topics'] for result in results] == [1, 2, 3, 4, 5]
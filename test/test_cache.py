@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+
+import qualkit.clean
+from qualkit.cache import TransformCache, config_hash, map_cached
+
+
+def test_map_cached(tmp_path):
+    cache = TransformCache(str(tmp_path))
+    calls = []
+
+    def upper(text):
+        calls.append(text)
+        return text.upper()
+
+    config = config_hash('upper')
+    series = pd.Series(['a', 'b', None, 'a'])
+    assert map_cached(series, upper, cache, config).tolist()[:2] == ['A', 'B']
+    assert calls == ['a', 'b']
+    result = map_cached(pd.Series(['b', 'c']), upper, cache, config)
+    assert result.tolist() == ['B', 'C']
+    assert calls == ['a', 'b', 'c']
+    stats = cache.stats()
+    assert stats['hits'] == 1
+    assert stats['misses'] == 3
+    assert stats['entries'] == 3
+
+    # a different configuration never sees the cached results
+    map_cached(pd.Series(['a']), upper, cache, config_hash('upper', 'v2'))
+    assert calls == ['a', 'b', 'c', 'a']
+
+
+def test_cache_persists(tmp_path):
+    df = pd.DataFrame({"text": ["I'm a teapot", "I dont know", np.nan, "Teams is good"]})
+    cache = TransformCache(str(tmp_path))
+    expected = qualkit.clean.clean(df, 'text')
+    assert qualkit.clean.clean(df, 'text', cache=cache).equals(expected)
+    cache.close()
+
+    cache = TransformCache(str(tmp_path))
+    assert qualkit.clean.clean(df, 'text', cache=cache).equals(expected)
+    assert cache.stats()['hits'] == 3
+    assert cache.stats()['misses'] == 0
+
+    cleaned = qualkit.clean.remove_dont_knows(expected, 'cleaned', cache=cache)
+    assert cleaned['cleaned'].tolist() == ['im a teapot', 'onlinelearningplatform is good']
+
+
+def test_cache_eviction(tmp_path):
+    cache = TransformCache(str(tmp_path), max_size=1000)
+    config = config_hash('identity')
+    for start in range(0, 100, 10):
+        map_cached(pd.Series([str(i) for i in range(start, start + 10)]), str, cache, config)
+    assert cache.stats()['size'] <= 1000
+    assert 0 < cache.stats()['entries'] < 100
+    # the most recent values are kept
+    map_cached(pd.Series(['99']), str, cache, config)
+    assert cache.stats()['hits'] == 1
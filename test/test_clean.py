@@ -1,6 +1,12 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
 import pandas as pd
 import qualkit.clean
+import qualkit.parallel
 import pytest
+from qualkit.cache import TransformCache
 
 def test_replace_dont_knows():
     text = qualkit.clean.__replace_dont_knows__('i dont know', 'idk')
@@ -14,6 +20,35 @@ def test_replace_domain_terms():
     assert text == 'I use a VLE'
 
 
+def test_term_matcher_prefers_longest_match():
+    matcher = qualkit.clean.TermMatcher(['ms team', 'ms teams', 'zoom'], leftmost_longest=True)
+    assert matcher.replace('ms teams or zoom', 'tool') == 'tool or tool'
+    assert matcher.findall('ms team and ms teams') == ['ms team', 'ms teams']
+
+
+def test_term_matcher_replaces_in_list_order():
+    matcher = qualkit.clean.TermMatcher(['ms team', 'ms teams', 'zoom'])
+    assert matcher.replace('ms teams or zoom', 'tool') == 'tools or tool'
+    # a replacement can be matched by a later term
+    assert qualkit.clean.replace_domain_terms('learn', ['learn', 'online'], 'online learn') == 'online learn learn'
+
+
+def test_clean_domain_terms_in_list_order():
+    df = pd.DataFrame({"text": ['teaching learning online', 'online teaching Teams', 'learn learning canvas']})
+    assert qualkit.clean.clean(df, 'text')['cleaned'].tolist() == [
+        'online learning learning', 'online online learninglearningplatform',
+        'online learning learninglearningplatform']
+    cleaner = qualkit.clean.Cleaner(leftmost_longest=True)
+    assert cleaner.clean(df, 'text')['cleaned'].tolist() == [
+        'teaching online learning', 'online learning onlinelearningplatform',
+        'learn online learninglearningplatform']
+
+
+def test_replace_domain_terms_whole_words():
+    text = qualkit.clean.replace_domain_terms('na or nan', ['na'], 'x', whole_words=True)
+    assert text == 'x or nan'
+
+
 def test_lemmatize():
     text = {"text": ['more seminars running helping cooks find']}
     df = pd.DataFrame(text, columns=['text'])
@@ -27,6 +62,15 @@ def test_lemmatize_string():
     assert output == 'more seminar run help cook find'
 
 
+def test_lemmatize_dedupe():
+    text = 'more seminars running helping cooks find'
+    df = pd.DataFrame({"text": [text, text, None]})
+    df = qualkit.clean.lemmatize(df, 'text', dedupe=True)
+    assert df['text'][0] == 'more seminar run help cook find'
+    assert df['text'][1] == 'more seminar run help cook find'
+    assert pd.isnull(df['text'][2])
+
+
 # More specific lemmatize tests
 # Gold Standard mainly uses output taken from here: https://cental.uclouvain.be/treetagger/
 def test_lem_isolate():
@@ -103,6 +147,39 @@ def test_remove_dont_knows():
     assert df['text'].iloc[0] == 'i think it needs more salt'
 
 
+def test_dont_know_classifier_mask():
+    df = pd.DataFrame({"q1": ['idk', 'more salt', 'not sure no comment', None],
+                       "q2": ['fine', 'dunno', 'fine', 'fine']},
+                      index=[10, 11, 12, 13])
+    mask = qualkit.clean.DontKnowClassifier().mask(df, ['q1', 'q2'])
+    assert mask.tolist() == [True, True, True, True]
+    mask = qualkit.clean.DontKnowClassifier().mask(df, 'q1')
+    assert mask.tolist() == [True, False, True, True]
+    assert list(mask.index) == [10, 11, 12, 13]
+
+
+def test_dont_know_classifier_is_dont_know():
+    classifier = qualkit.clean.DontKnowClassifier()
+    assert classifier.is_dont_know('i dont know to be honest')
+    assert classifier.is_dont_know('  no idea  ')
+    assert not classifier.is_dont_know('nothing')
+
+
+def test_remove_dont_knows_dedupe():
+    df = pd.DataFrame({"text": ['idk', 'more salt', 'idk', 'more salt', None]})
+    df = qualkit.clean.remove_dont_knows(df, 'text', dedupe=True)
+    assert list(df.index) == [1, 3]
+
+
+def test_map_unique():
+    calls = []
+    series = pd.Series(['no', 'yes', 'no', None], index=[3, 2, 1, 0])
+    output = qualkit.clean.map_unique(series, lambda x: calls.append(x) or x.upper())
+    assert calls == ['no', 'yes']
+    assert output[:3].tolist() == ['NO', 'YES', 'NO']
+    assert pd.isnull(output[0])
+
+
 def test_clean():
     text = {"text": ["I'm a teapot"]}
     df = pd.DataFrame(text, columns=['text'])
@@ -137,6 +214,20 @@ def test_clean_multiple_inplace():
     assert df['text1'].iloc[0] == 'im a teapot'
 
 
+def test_clean_dedupe():
+    df = pd.DataFrame({"text": ["I'm a teapot", "-", "I'm a teapot"]})
+    assert qualkit.clean.clean(df, 'text', dedupe=True).equals(qualkit.clean.clean(df, 'text'))
+
+
+def test_clean_dedupe_missing_values(tmp_path):
+    # only np.nan itself is passed through; other values, including None, are cleaned as strings
+    df = pd.DataFrame({"text": [None, float('nan'), np.nan, "I'm a teapot", None, np.nan]})
+    expected = qualkit.clean.clean(df, 'text')
+    assert expected['cleaned'].tolist()[:4] == ['none', 'nan', np.nan, 'im a teapot']
+    assert qualkit.clean.clean(df, 'text', dedupe=True).equals(expected)
+    assert qualkit.clean.clean(df, 'text', cache=TransformCache(str(tmp_path))).equals(expected)
+
+
 def test_clean_multiple():
     text = {
             "text1": ["I'm a teapot", "", "row three :)"],
@@ -146,3 +237,112 @@ def test_clean_multiple():
     df = pd.DataFrame(text)
     df = qualkit.clean.clean(df, ['text1', 'text2', 'text3'])
     assert df['cleaned'].iloc[0] == 'im a teapot'
+
+
+def test_cleaner_reused_across_columns():
+    cleaner = qualkit.clean.Cleaner(online_learning_platform_list=['vle'])
+    df = pd.DataFrame({"text": ["We use the VLE and Teams", "-"]})
+    df = cleaner.clean(df, 'text')
+    assert df['cleaned'].iloc[0] == 'we use the onlinelearningplatform and onlinelearningplatform'
+    assert pd.isnull(df['cleaned'].iloc[1])
+    assert cleaner.clean_string("1:1 on Zoom") == 'onetoone on onlinemeetingtool'
+
+
+def test_cleaner_domain_lengths_must_match():
+    with pytest.raises(ValueError):
+        qualkit.clean.Cleaner(domain_term=[['a'], ['b']], domain_string=['c'])
+
+
+def test_lemmatize_n_jobs():
+    df = pd.DataFrame({"text": ['more seminars running helping cooks find', 'i feel isolated', None]})
+    df = qualkit.clean.lemmatize(df, 'text', n_jobs=2, chunksize=1)
+    assert df['text'].tolist()[:2] == ['more seminar run help cook find', 'i feel isolate']
+
+
+def test_clean_csv(tmp_path):
+    text = {"text": ["I'm a teapot", "I dont know", "", "Short and stout", "dunno", "Teams is good"]}
+    src = tmp_path / 'src.csv'
+    dst = tmp_path / 'dst.csv'
+    pd.DataFrame(text).to_csv(src, index=False)
+    rows = qualkit.clean.clean_csv(src, dst, 'text', chunksize=2, lemmatize_text=False)
+    output = pd.read_csv(dst)
+    assert rows == 3
+    assert output['cleaned'].tolist() == ['im a teapot', 'short and stout', 'onlinelearningplatform is good']
+    assert output['text'].tolist() == ["I'm a teapot", 'Short and stout', 'Teams is good']
+
+
+def upper_chunk(texts):
+    return [text.upper() for text in texts]
+
+
+def no_setup():
+    pass
+
+
+def test_clean_chunks_shares_one_pool(monkeypatch):
+    started = []
+
+    class CountingExecutor(ProcessPoolExecutor):
+        def __init__(self, *args, **kwargs):
+            started.append(kwargs)
+            super().__init__(*args, **kwargs)
+
+    # stand-ins for the NLTK workers, so only the pool handling is tested
+    monkeypatch.setattr(qualkit.parallel, 'ProcessPoolExecutor', CountingExecutor)
+    monkeypatch.setattr(qualkit.clean, '__init_lemmatize_worker__', no_setup)
+    monkeypatch.setattr(qualkit.clean, '__lemmatize_chunk__', upper_chunk)
+    text = {"a": ["Tea pot", "short", "stout", "handle"] * 3, "b": ["spout", "tip", "pour", "out"] * 3}
+    chunks = [pd.DataFrame(text).iloc[i:i + 4] for i in range(0, 12, 4)]
+    results = list(qualkit.clean.clean_chunks(chunks, ['a', 'b'], drop_dont_knows=False, n_jobs=2))
+    assert len(started) == 1
+    assert results[2]['cleaned_b'].tolist() == ['SPOUT', 'TIP', 'POUR', 'OUT']
+    assert results[0]['cleaned'].tolist() == ['TEA POT', 'SHORT', 'STOUT', 'HANDLE']
+
+
+def test_clean_arrow_strings():
+    pytest.importorskip('pyarrow')
+    text = {"text": ["I'm a teapot", "-", None, "We use Teams and Moodle"]}
+    df = pd.DataFrame(text).astype('string[pyarrow]')
+    df = qualkit.clean.clean(df, 'text')
+    assert df['cleaned'].dtype == 'string[pyarrow]'
+    assert df['cleaned'].iloc[0] == 'im a teapot'
+    assert pd.isnull(df['cleaned'].iloc[1])
+    assert pd.isnull(df['cleaned'].iloc[2])
+    assert df['cleaned'].iloc[3] == 'we use onlinelearningplatform and onlinelearningplatform'
+
+
+def test_term_matcher_replace_series_whole_words():
+    pytest.importorskip('pyarrow')
+    series = pd.Series(['zoom call', 'zoomed in', None], dtype='string[pyarrow]')
+    for leftmost_longest in (False, True):
+        matcher = qualkit.clean.TermMatcher(['zoom'], whole_words=True, leftmost_longest=leftmost_longest)
+        result = matcher.replace_series(series, 'x')
+        assert result.dtype == 'string[pyarrow]'
+        assert result.iloc[:2].tolist() == ['x call', 'zoomed in']
+        assert pd.isnull(result.iloc[2])
+
+
+def test_clean_dtype():
+    pytest.importorskip('pyarrow')
+    df = pd.DataFrame({"text": ["I'm a teapot", "idk"]})
+    df = qualkit.clean.clean(df, 'text', dtype='string[pyarrow]')
+    assert df['cleaned'].dtype == 'string[pyarrow]'
+    assert df['text'].dtype == object
+    assert qualkit.clean.remove_dont_knows(df, 'cleaned')['cleaned'].tolist() == ['im a teapot']
+
+
+def test_term_list_registry(tmp_path):
+    path = tmp_path / 'apps.txt'
+    path.write_text('# apps\nmicrosoft teams\nzoom\n')
+    registry = qualkit.clean.TermListRegistry(str(tmp_path))
+    terms = registry.get('apps.txt')
+    assert registry.get('apps.txt') is terms
+    assert 'zoom' in terms.tokens
+    assert terms.replace('zoom and microsoft teams', 'app') == 'app and app'
+
+    path.write_text('# apps\nmicrosoft teams\nzoom\nslack\n')
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000000000))
+    terms = registry.get('apps.txt')
+    assert 'slack' in terms
+    assert len(terms) == 3
@@ -0,0 +1,38 @@
+import numpy as np
+from scipy.sparse import csr_matrix
+
+from qualkit.coherence import topic_coherence
+
+
+def test_topic_coherence():
+    # terms 0 and 1 always appear together; terms 2 and 3 never do
+    matrix = csr_matrix(np.array([
+        [1, 1, 1, 0],
+        [2, 1, 0, 1],
+        [0, 0, 1, 0],
+        [0, 0, 0, 3],
+    ]))
+    coherence = topic_coherence(matrix, [[0, 1], [2, 3]])
+    assert coherence['topic'].tolist() == [1, 2]
+    assert np.isclose(coherence['npmi'][0], 1.0)
+    assert np.isclose(coherence['npmi'][1], -1.0)
+    assert np.isclose(coherence['umass'][0], np.log(3 / 2))
+    assert np.isclose(coherence['umass'][1], np.log(1 / 2))
+
+
+def test_topic_coherence_single_term():
+    coherence = topic_coherence(csr_matrix(np.eye(3)), [[0]])
+    assert np.isnan(coherence['npmi'][0])
+
+
+def test_topic_coherence_overall():
+    matrix = csr_matrix(np.array([
+        [1, 1, 1, 0],
+        [2, 1, 0, 1],
+        [0, 0, 1, 0],
+        [0, 0, 0, 3],
+    ]))
+    per_topic, overall = topic_coherence(matrix, [[0, 1], [2, 3], [0]], overall=True)
+    assert len(per_topic) == 3
+    assert np.isclose(overall['npmi'], 0.0)
+    assert np.isclose(overall['umass'], (np.log(3 / 2) + np.log(1 / 2)) / 2)
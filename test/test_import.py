@@ -0,0 +1,32 @@
+import subprocess
+import sys
+
+# importing a qualkit module should take well under this many seconds
+IMPORT_TIME_BUDGET = 5.0
+
+
+def run_python(code):
+    result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True)
+    return result.stdout.strip()
+
+
+def test_import_does_not_download_or_load_models():
+    output = run_python(
+        "import sys, nltk\n"
+        "def fail(*args, **kwargs): raise AssertionError('nltk.download called at import')\n"
+        "nltk.download = fail\n"
+        "import qualkit.clean, qualkit.topics, qualkit.keywords, qualkit.sentiment, qualkit.stopwords\n"
+        "import qualkit.anchored_topic_model\n"
+        "print(sorted(m for m in ('sklearn.decomposition', 'corextopic') if m in sys.modules))"
+    )
+    assert output == '[]'
+
+
+def test_import_time():
+    output = run_python(
+        "import time\n"
+        "start = time.perf_counter()\n"
+        "import qualkit.clean\n"
+        "print(time.perf_counter() - start)"
+    )
+    assert float(output) < IMPORT_TIME_BUDGET
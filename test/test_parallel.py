@@ -0,0 +1,55 @@
+import os
+from qualkit import parallel
+
+
+def test_effective_n_jobs():
+    assert parallel.effective_n_jobs(None) == 1
+    assert parallel.effective_n_jobs(3) == 3
+    assert parallel.effective_n_jobs(-1) == (os.cpu_count() or 1)
+
+
+def test_map_chunks_keeps_order():
+    chunks = parallel.split(list(range(10)), 3)
+    assert chunks == [[0, 1, 2], [3, 4, 5], [6, 7, 8], [9]]
+    assert parallel.map_chunks(sum, chunks, n_jobs=2) == [3, 12, 21, 9]
+
+
+def test_imap_keeps_order():
+    assert list(parallel.imap(abs, [-3, 2, -1], n_jobs=2)) == [3, 2, 1]
+
+
+def test_share_csr(tmp_path):
+    from scipy.sparse import csr_matrix
+    matrix = csr_matrix([[0, 1, 0], [2, 0, 3]])
+    shared = parallel.load_csr(parallel.share_csr(matrix, str(tmp_path)))
+    assert (shared != matrix).nnz == 0
+    assert shared.shape == (2, 3)
+
+
+def test_share_csr_unsorted_indices(tmp_path):
+    import numpy as np
+    from scipy.sparse import csr_matrix
+    matrix = csr_matrix((np.array([1., 2., 3.]), np.array([2, 0, 1]), np.array([0, 2, 3])), shape=(2, 3))
+    shared = parallel.load_csr(parallel.share_csr(matrix, str(tmp_path)))
+    assert shared.has_sorted_indices
+    assert shared.max() == 3
+    assert (shared != matrix).nnz == 0
+
+
+def test_imap_unordered_returns_positions():
+    results = dict(parallel.imap_unordered(abs, [-3, 2, -1], n_jobs=2))
+    assert results == {0: 3, 1: 2, 2: 1}
+
+
+def chunk_pid(chunk):
+    return os.getpid()
+
+
+def test_map_chunks_reuses_pool():
+    with parallel.pool(2) as executor:
+        first = parallel.map_chunks(chunk_pid, [1, 2, 3, 4], 2, executor=executor)
+        second = parallel.map_chunks(chunk_pid, [1, 2, 3, 4], 2, executor=executor)
+    assert len(set(first) | set(second)) <= 2
+    assert os.getpid() not in first
+    with parallel.pool(1) as executor:
+        assert executor is None
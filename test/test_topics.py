@@ -0,0 +1,119 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from qualkit.topics import TokenAnalyzer, LdaTopicModel, lda_topic_sweep, lda_with_keywords
+
+TEXTS = ['online learning on zoom', 'zoom lectures were good', 'the library was quiet',
+         'quiet study space in the library', 'good online tutors', 'more library space please'] * 5
+
+
+def keyword_data():
+    """
+    :return: the output of lda() for a few responses, with words that are their own lemmas so
+    the keywords don't depend on the lemmatizer
+    """
+    return pd.DataFrame({
+        'cleaned': ['online learning on zoom', 'zoom lecture recording and quiet library', 'the library was quiet',
+                    'quiet study space in the library', 'good online tutor', 'online tutor feedback',
+                    'group work on zoom', 'recording of the lecture', None],
+        'Dominant_topic': [1, 1, 2, 2, 3, 3, 1, 1, 2],
+        'Topic_keywords': [['zoom', 'online learning', 'recording']] * 2 + [['library', 'quiet study', 'space']] * 2
+                          + [['tutor', 'online']] * 2 + [['zoom', 'recording']] * 3,
+    })
+
+
+def test_token_analyzer_ngrams():
+    analyzer = TokenAnalyzer(stop_words=['the'])
+    terms = analyzer.ngrams(['Online', 'learning', 'e-mail', 'x', 'zoom'])
+    assert terms == ['online', 'learning', 'mail', 'zoom', 'online learning', 'learning mail', 'mail zoom']
+
+
+def test_token_analyzer_ngram_range():
+    analyzer = TokenAnalyzer(stop_words=[], ngram_range=(2, 3))
+    assert analyzer.ngrams(['we', 'use', 'zoom']) == ['we use', 'use zoom', 'we use zoom']
+
+
+def test_lda_topic_model_save_load(tmp_path):
+    data = pd.DataFrame({'cleaned': TEXTS})
+    model = LdaTopicModel(num_topics=2).fit(data)
+    model.save(str(tmp_path))
+    loaded = LdaTopicModel.load(str(tmp_path))
+    expected = model.transform(data.head(4))
+    pd.testing.assert_frame_equal(loaded.transform(data.head(4)), expected)
+    assert set(expected['Dominant_topic']) <= {1, 2}
+    assert expected['Topic_keywords'].iloc[0]
+
+
+def test_lda_topic_model_save_random_state(tmp_path):
+    chunks = [pd.DataFrame({'cleaned': TEXTS})]
+    model = LdaTopicModel(num_topics=2).fit_stream(chunks, random_state=np.random.RandomState(0))
+    model.save(str(tmp_path))
+    loaded = LdaTopicModel.load(str(tmp_path))
+    pd.testing.assert_frame_equal(loaded.transform(chunks[0].head(4)), model.transform(chunks[0].head(4)))
+
+
+def test_lda_topic_model_fit_stream():
+    chunks = [pd.DataFrame({'cleaned': TEXTS[i:i + 10]}) for i in range(0, len(TEXTS), 10)]
+    progress = []
+    model = LdaTopicModel(num_topics=2).fit_stream(chunks, callback=lambda *args: progress.append(args))
+    assert progress[-1] == (1, 3, 30)
+    assert 'library' in model.feature_names
+    assert len(model.transform(chunks[0])) == 10
+
+
+def test_fit_stream_needs_rereadable_chunks():
+    chunks = (pd.DataFrame({'cleaned': ['online learning']}) for _ in range(2))
+    with pytest.raises(ValueError):
+        LdaTopicModel(num_topics=2).fit_stream(chunks)
+
+
+def test_lda_topic_sweep():
+    seen = []
+    results = lda_topic_sweep(pd.DataFrame({'cleaned': TEXTS}), k_range=range(2, 5), callback=seen.append)
+    assert [result['topics'] for result in results] == [2, 3, 4]
+    assert seen == results
+    for result in results:
+        assert {'perplexity', 'log_likelihood', 'npmi', 'umass', 'fit_time'} <= set(result)
+
+
+def test_lda_topic_sweep_early_stop():
+    data = pd.DataFrame({'cleaned': TEXTS})
+    # no model can improve on the best perplexity by 100%, so each one after the first counts towards patience
+    results = lda_topic_sweep(data, k_range=range(2, 7), early_stop=1.0, callback=lambda result: None)
+    assert [result['topics'] for result in results] == [2, 3]
+    results = lda_topic_sweep(data, k_range=range(2, 7), early_stop=1.0, patience=2, callback=lambda result: None)
+    assert [result['topics'] for result in results] == [2, 3, 4]
+
+
+def test_lda_topic_sweep_n_jobs():
+    data = pd.DataFrame({'cleaned': TEXTS})
+    serial = lda_topic_sweep(data, k_range=range(2, 5), callback=lambda result: None)
+    parallel = lda_topic_sweep(data, k_range=range(2, 5), n_jobs=2, callback=lambda result: None)
+    for expected, result in zip(serial, parallel):
+        del expected['fit_time'], result['fit_time']
+        assert result == pytest.approx(expected)
+    assert len(parallel) == len(serial)
+
+
+def test_lda_with_keywords():
+    records = lda_with_keywords(keyword_data()).to_dict(orient='records')
+    # the order of keywords with the same score isn't fixed, so compare them sorted
+    rows = sorted((record['topic_number'], ' / '.join(sorted(record['term'].split(' / '))), record['parent'],
+                   record['score']) for record in records)
+    assert rows == [
+        (1.0, 'zoom lecture recording', '', 9.0),
+        (1.1, 'online learning', 'zoom lecture recording', 4.0),
+        (1.1, 'recording', 'zoom lecture recording', 1.0),
+        (1.1, 'zoom', 'zoom lecture recording', 1.0),
+        (2.0, 'quiet study space', '', 9.0),
+        (2.1, 'library', 'quiet study space', 1.0),
+        (3.0, 'good online tutor / online tutor feedback', '', 9.0),
+    ]
+    terms = {record['term']: record['term_list'] for record in records}
+    assert set(terms['online learning']) == {'online learning', 'online', 'learning'}
+
+
+def test_lda_with_keywords_n_jobs():
+    data = keyword_data()
+    pd.testing.assert_frame_equal(lda_with_keywords(data, n_jobs=2), lda_with_keywords(data, n_jobs=1))
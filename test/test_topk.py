@@ -0,0 +1,36 @@
+import numpy as np
+
+from qualkit.topk import feature_names, top_indices, top_terms
+
+
+def test_top_indices():
+    weights = np.array([[0.1, 0.5, 0.3, 0.5], [4.0, 1.0, 2.0, 3.0]])
+    indices, values = top_indices(weights, 3)
+    assert indices.tolist() == [[1, 3, 2], [0, 3, 2]]
+    assert values.tolist() == [[0.5, 0.5, 0.3], [4.0, 3.0, 2.0]]
+
+
+def test_top_indices_ties_at_k():
+    weights = np.random.default_rng(0).integers(0, 3, (4, 50))
+    indices, _ = top_indices(weights, 5)
+    assert indices.tolist() == np.argsort(-weights, axis=1, kind='stable')[:, :5].tolist()
+
+
+def test_top_indices_k_larger_than_vocabulary():
+    indices, _ = top_indices(np.array([[1.0, 3.0, 2.0]]), 10)
+    assert indices.tolist() == [[1, 2, 0]]
+
+
+def test_top_terms():
+    weights = np.array([[0.1, 0.5, 0.3], [4.0, 1.0, 2.0]])
+    terms = top_terms(weights, ['apple', 'banana', 'carrot'], k=2)
+    assert terms.columns.tolist() == ['topic', 'rank', 'term', 'weight']
+    assert terms['topic'].tolist() == [1, 1, 2, 2]
+    assert terms['rank'].tolist() == [1, 2, 1, 2]
+    assert terms['term'].tolist() == ['banana', 'carrot', 'apple', 'carrot']
+
+
+def test_feature_names():
+    from sklearn.feature_extraction.text import CountVectorizer
+    vectorizer = CountVectorizer().fit(['zoom lecture', 'library'])
+    assert list(feature_names(vectorizer)) == ['lecture', 'library', 'zoom']